@@ -0,0 +1,393 @@
+"""
+asyncio version of the scrape pipeline: navigation, captcha and consent handling, the
+details page and extraction, with many tabs multiplexed from one event loop.
+
+The pipeline only talks to a tab through a small interface, so it runs the same on a
+real browser (CdpTab / CdpBrowserPool, on seleniumbase's asyncio CDP driver) and on
+the offline stand-in in benchmarks/fake_browser.py:
+
+    await tab.open(url)                       navigate and wait for the load event
+    await tab.signals()                       readiness.PAGE_SIGNALS_SCRIPT results
+    await tab.content()                       page source
+    await tab.click(selector)                 click the first match, True if there was one
+    await tab.press_and_hold(selector, secs)  hold the mouse down on an element
+    await tab.close()
+"""
+import asyncio
+import logging
+import time
+from urllib.parse import urljoin
+
+from database import empty_record
+from checkpoint import DONE, FAILED
+import metrics
+import parse_pool
+from http_fetch import BASE_URL, results_url, find_details_link
+from lookup_cache import normalize_lookup_key, note_not_found, is_positive_result, is_cacheable_result
+from page_state import RESULT_COUNT_RE, BLOCKED, PRESS_HOLD, CLICK_CAPTCHA, NOT_FOUND, PRESS_HOLD_MARKER
+from rate_limiter import throttle_async
+import retry_policy
+from retry_policy import note_failure
+from readiness import PAGE_SIGNALS_SCRIPT, PHASE_TIMEOUTS, CHALLENGE_SIGNALS, match_phase
+
+logger = logging.getLogger(__name__)
+
+PRESS_HOLD_SELECTOR = '#px-captcha'
+CLICK_CAPTCHA_SELECTOR = 'iframe[src*="challenges.cloudflare.com"]'
+CONSENT_BUTTON_SELECTOR = 'button.fc-cta-consent'
+
+async def wait_for_page_state_async(tab, phase, timeout=None, poll_interval=0.25):
+    """readiness.wait_for_page_state for a tab; other lookups keep running while it polls."""
+    if timeout is None:
+        timeout = PHASE_TIMEOUTS[phase]
+    started = time.time()
+    deadline = started + timeout
+    while True:
+        try:
+            signals = await tab.signals()
+        except Exception as e:
+            logger.debug(f"Page signal check failed: {e}")
+            signals = []
+        found = match_phase(phase, signals)
+        if found:
+            logger.debug(f"Page ready for '{phase}' ({found}) after {time.time() - started:.1f}s")
+            return found
+        if time.time() >= deadline:
+            logger.info(f"No '{phase}' signal within {timeout}s, continuing")
+            return None
+        await asyncio.sleep(poll_interval)
+
+async def capture_snapshot(tab):
+    # Parsing happens off the event loop so a big page doesn't stall the other tabs
+    return await parse_pool.pool.snapshot_async(await tab.content())
+
+async def handle_challenges_async(tab, state, hold_time=12):
+    """Solve press & hold or click captchas until the page is clear; returns the last state."""
+    for _ in range(2):  # A captcha can reload once
+        if state == PRESS_HOLD:
+            logger.info("Press & hold captcha detected, holding")
+            await tab.press_and_hold(PRESS_HOLD_SELECTOR, hold_time)
+        elif state == CLICK_CAPTCHA:
+            logger.info("Click captcha detected, clicking")
+            await tab.click(CLICK_CAPTCHA_SELECTOR)
+        else:
+            return state
+        await wait_for_page_state_async(tab, 'challenge_cleared')
+        state = await wait_for_page_state_async(tab, 'results', timeout=2)
+    return state
+
+async def scrape_person_data_async(tab, name, address, current_proxy, base_url=BASE_URL, hold_time=12, attempt=None):
+    """
+    Same result as cap.scrape_person_data: (data, is_blocked), with the reason for no
+    data left in attempt['failure'].
+    """
+    await throttle_async(current_proxy)
+    await tab.open(results_url(name, address, base_url))
+    state = await wait_for_page_state_async(tab, 'results')
+    if state in CHALLENGE_SIGNALS:
+        await handle_challenges_async(tab, state, hold_time)
+    snapshot = await capture_snapshot(tab)
+    if snapshot.kind == BLOCKED:
+        logger.warning(f"Proxy {current_proxy} is blocked")
+        return None, True
+    if snapshot.is_challenge:
+        logger.warning(f"Challenge still showing for {name}, giving up on this attempt")
+        note_failure(attempt, retry_policy.CHALLENGE_TIMEOUT)
+        return None, False
+    if snapshot.has_consent:
+        await tab.click(CONSENT_BUTTON_SELECTOR)
+
+    count_match = RESULT_COUNT_RE.search(snapshot.text)
+    if count_match is None and snapshot.kind != NOT_FOUND:
+        # Neither a count nor "no records": not a page we can call a miss
+        logger.warning(f"No results count on the {snapshot.kind} page for {name}")
+        note_failure(attempt, retry_policy.SELECTOR_MISS)
+        return None, False
+    remarks = count_match.group(0).strip() if count_match else f'Record Not Found against {name}.'
+    number_found = int(count_match.group(1)) if count_match else 0
+    logger.info(remarks)
+    if number_found == 0:
+        note_not_found(attempt)
+    if number_found == 0 or number_found > 6:
+        return empty_record(remarks, current_proxy), False
+
+    link = find_details_link(snapshot.html)
+    if link is None:
+        logger.error(f"No details link on the results page for {name}")
+        note_failure(attempt, retry_policy.SELECTOR_MISS)
+        return None, False
+    await throttle_async(current_proxy)
+    await tab.open(urljoin(base_url + '/', link))
+    state = await wait_for_page_state_async(tab, 'details')
+    if state in CHALLENGE_SIGNALS:
+        await handle_challenges_async(tab, state, hold_time)
+    details = await capture_snapshot(tab)
+    if details.has_consent:
+        await tab.click(CONSENT_BUTTON_SELECTOR)
+    if details.is_blocked or PRESS_HOLD_MARKER in details.text:
+        return None, True
+    if details.is_challenge:
+        logger.warning(f"Challenge still showing on the details page for {name}, giving up on this attempt")
+        note_failure(attempt, retry_policy.CHALLENGE_TIMEOUT)
+        return None, False
+    data = await parse_pool.pool.extract_async(details.text, current_proxy)
+    logger.info(f'Record found for {name}!')
+    return data, False
+
+async def run_async_lookups(rows, open_tab, tabs=8, max_retries=5, on_result=None,
+                            base_url=BASE_URL, hold_time=12, proxy_scheduler=None):
+    """
+    Look up `rows` (row_ids, name, address) with `tabs` tabs in flight at once.
+    `open_tab(blocked_proxy)` is a coroutine returning (tab, proxy), or (None, None) when
+    no proxy is left; it is called again after a block with the blocked proxy (and records
+    the block), and with None when the tab is replaced after an error or a failure whose
+    retry needs a fresh session.
+    Failed attempts are retried (or not) as retry_policy.policy decides for their failure
+    class, like worker_pool does; phase timings go to metrics.recorder and, with a
+    proxy_scheduler, every attempt that was not a block to record_attempt.
+    `on_result(row_ids, name, address, data, success, attempt)` is called for every row,
+    with an empty record and success False once the row is given up; attempt is the dict
+    of the last attempt, which tells whether a miss may be cached.
+    Returns {'processed', 'failed', 'blocked'} counts.
+    """
+    row_queue = asyncio.Queue()
+    for row in rows:
+        row_queue.put_nowait(row)
+    stats = {'processed': 0, 'failed': 0, 'blocked': 0}
+
+    async def worker(tab_id):
+        tab, proxy = await open_tab(None)
+        try:
+            while tab is not None:
+                try:
+                    row_ids, name, address = row_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                timing = metrics.recorder.row(row_ids)
+                data, success, attempt = None, False, {}
+                retries = retry_policy.policy.row()
+                while not success and retries.attempts < max_retries and tab is not None:
+                    attempt = timing.new_attempt()
+                    attempt_start = time.time()
+                    raised = False
+                    try:
+                        data, is_blocked = await scrape_person_data_async(tab, name, address, proxy,
+                                                                          base_url, hold_time, attempt)
+                        failure = retry_policy.classify_result(data, is_blocked, attempt)
+                        outcome = 'blocked' if is_blocked else 'ok' if data is not None else 'empty'
+                    except Exception as e:
+                        logger.error(f"[tab {tab_id}] Error: {str(e)}")
+                        data, failure, outcome, raised = None, retry_policy.classify_exception(e), 'error', True
+                    latency = time.time() - attempt_start
+                    attempt['failure'] = failure
+                    timing.end_attempt(attempt, proxy, outcome, latency)
+                    if proxy_scheduler is not None and failure != retry_policy.PROXY_BLOCK:
+                        await asyncio.to_thread(proxy_scheduler.record_attempt, proxy, failure is None, latency,
+                                                attempt.get('challenges', 0))
+                    if failure is None:
+                        success = True
+                        break
+                    decision = retries.record(failure)
+                    logger.warning(f"[tab {tab_id}] Row {row_ids[0] + 1} attempt {retries.attempts} failed ({failure}): "
+                                   f"{'retrying' if decision.retry else 'giving up'}")
+                    if failure == retry_policy.PROXY_BLOCK:
+                        stats['blocked'] += 1
+                        await tab.close()
+                        tab, proxy = await open_tab(proxy)
+                    elif raised or decision.new_session or decision.rotate_proxy:
+                        # An error may have left the tab (or its browser) unusable
+                        await tab.close()
+                        tab, proxy = await open_tab(None)
+                    if not decision.retry:
+                        break
+                    await asyncio.sleep(decision.delay)
+                stats['processed'] += 1
+                if not success:
+                    stats['failed'] += 1
+                    logger.error(f"[tab {tab_id}] Failed to process row {row_ids[0] + 1}: {name} "
+                                 f"after {retries.attempts} attempts ({retries.describe()})")
+                    data = empty_record(f'Failed after {retries.attempts} attempts: {retries.last_failure}', proxy)
+                outcome = ('found' if is_positive_result(data) else 'not_found') if success else 'failed'
+                metrics.recorder.finish(timing, outcome, proxy)
+                if on_result is not None:
+                    on_result(row_ids, name, address, data, success, attempt)
+            if tab is None:
+                logger.error(f"[tab {tab_id}] No more proxies available. Stopping.")
+        finally:
+            if tab is not None:
+                await tab.close()
+
+    await asyncio.gather(*(worker(i + 1) for i in range(tabs)))
+    return stats
+
+class CdpTab:
+    """The tab interface over a seleniumbase cdp_driver Tab."""
+
+    def __init__(self, tab, on_close=None):
+        self.tab = tab
+        self.on_close = on_close
+
+    async def open(self, url):
+        await self.tab.get(url)
+
+    async def evaluate(self, script):
+        # PAGE_SIGNALS_SCRIPT and friends are execute_script bodies ending in `return`
+        return await self.tab.evaluate(f"(function() {{ {script} }})()")
+
+    async def signals(self):
+        return await self.evaluate(PAGE_SIGNALS_SCRIPT) or []
+
+    async def content(self):
+        return await self.tab.get_content()
+
+    async def _center(self, selector):
+        return await self.evaluate(f"""
+            var el = document.querySelector({selector!r});
+            if (!el) {{ return null; }}
+            var r = el.getBoundingClientRect();
+            return [r.left + r.width / 2, r.top + r.height / 2];
+        """)
+
+    async def click(self, selector):
+        return bool(await self.evaluate(f"""
+            var el = document.querySelector({selector!r});
+            if (el && el.tagName !== 'IFRAME') {{ el.click(); return true; }}
+            return false;
+        """) or await self._mouse(selector, 0.1))
+
+    async def press_and_hold(self, selector, seconds):
+        return await self._mouse(selector, seconds)
+
+    async def _mouse(self, selector, seconds):
+        import mycdp as cdp  # ships with seleniumbase
+        center = await self._center(selector)
+        if not center:
+            return False
+        x, y = center
+        button = cdp.input_.MouseButton('left')
+        await self.tab.send(cdp.input_.dispatch_mouse_event('mouseMoved', x=x, y=y))
+        await self.tab.send(cdp.input_.dispatch_mouse_event('mousePressed', x=x, y=y, button=button,
+                                                            buttons=1, click_count=1))
+        await asyncio.sleep(seconds)
+        await self.tab.send(cdp.input_.dispatch_mouse_event('mouseReleased', x=x, y=y, button=button,
+                                                            buttons=1, click_count=1))
+        return True
+
+    async def close(self):
+        try:
+            await self.tab.close()
+        except Exception as e:
+            logger.warning(f"Error closing tab: {e}")
+        if self.on_close is not None:
+            on_close, self.on_close = self.on_close, None
+            on_close()
+
+class PooledBrowser:
+    """One browser of a CdpBrowserPool: its proxy, its open tabs, and whether it takes new ones."""
+
+    def __init__(self, proxy, browser):
+        self.proxy = proxy
+        self.browser = browser
+        self.tabs = 0
+        self.retired = False
+
+    def stop(self):
+        try:
+            self.browser.stop()
+        except Exception as e:
+            logger.warning(f"Error closing browser for {self.proxy}: {e}")
+
+class CdpBrowserPool:
+    """
+    Opens tabs for run_async_lookups: one browser per proxy from `proxy_scheduler`, with up
+    to tabs_per_browser tabs sharing it. A blocked proxy's browser is retired: its block is
+    recorded once, it gets no new tabs, and it is shut down when its last tab closes.
+    """
+
+    def __init__(self, proxy_scheduler, tabs_per_browser=4, headless=False):
+        self.proxy_scheduler = proxy_scheduler
+        self.tabs_per_browser = tabs_per_browser
+        self.headless = headless
+        self._browsers = []
+        self._lock = asyncio.Lock()
+
+    def _retire(self, pooled):
+        pooled.retired = True
+        if not pooled.tabs:
+            self._browsers.remove(pooled)
+            pooled.stop()
+
+    def _tab_closed(self, pooled):
+        pooled.tabs -= 1
+        if pooled.retired and not pooled.tabs and pooled in self._browsers:
+            self._browsers.remove(pooled)
+            pooled.stop()
+
+    async def open_tab(self, blocked_proxy=None):
+        from seleniumbase.undetected.cdp_driver import cdp_util
+        async with self._lock:
+            if blocked_proxy is not None:
+                blocked = [b for b in self._browsers if b.proxy == blocked_proxy and not b.retired]
+                # Sibling tabs see the same block: only the first report counts against the proxy
+                if blocked:
+                    await asyncio.to_thread(self.proxy_scheduler.record_block, blocked_proxy)
+                for pooled in blocked:
+                    self._retire(pooled)
+            pooled = next((b for b in self._browsers if not b.retired and b.tabs < self.tabs_per_browser), None)
+            if pooled is not None:
+                try:
+                    tab = await pooled.browser.get('about:blank', new_tab=True)
+                except Exception as e:
+                    # The browser died under its other tabs: start a new one on another proxy
+                    logger.warning(f"Could not open a tab on the browser for {pooled.proxy}: {e}")
+                    self._retire(pooled)
+                    await asyncio.to_thread(self.proxy_scheduler.release, pooled.proxy)
+                    pooled = None
+            if pooled is None:
+                proxy = await asyncio.to_thread(self.proxy_scheduler.acquire)
+                if proxy is None:
+                    return None, None
+                ip, port, username, password = proxy.split(':')
+                pooled = PooledBrowser(proxy, await cdp_util.start_async(
+                    proxy=f"{username}:{password}@{ip}:{port}", headless=self.headless))
+                self._browsers.append(pooled)
+                tab = await pooled.browser.get('about:blank', new_tab=True)
+            pooled.tabs += 1
+            return CdpTab(tab, lambda: self._tab_closed(pooled)), pooled.proxy
+
+    def close(self):
+        for pooled in self._browsers:
+            pooled.stop()
+            if not pooled.retired:
+                self.proxy_scheduler.release(pooled.proxy)
+        self._browsers.clear()
+
+def run_async_pool(rows, input_file_name, proxy_scheduler, tabs, writer, tabs_per_browser=4,
+                   max_retries=5, headless=False):
+    """
+    cap.py's --async-tabs mode: run_async_lookups on real browsers, saving through `writer`
+    exactly like the thread pool does.
+    """
+    def on_result(row_ids, name, address, data, success, attempt):
+        for row_id in row_ids:
+            writer.save(row_id, data)
+            writer.progress(row_id, input_file_name, DONE if success else FAILED)
+        if success and is_cacheable_result(data, attempt):
+            writer.cache(normalize_lookup_key(name, address), data)
+
+    async def run():
+        browsers = CdpBrowserPool(proxy_scheduler, tabs_per_browser, headless)
+        try:
+            return await run_async_lookups(rows, browsers.open_tab, tabs, max_retries, on_result,
+                                           proxy_scheduler=proxy_scheduler)
+        finally:
+            browsers.close()
+
+    started = time.time()
+    stats = asyncio.run(run())
+    writer.flush()
+    elapsed = time.time() - started
+    rate = stats['processed'] / elapsed * 3600 if elapsed else 0
+    logger.info(f"Async pool finished {stats['processed']} rows ({stats['failed']} failed, "
+                f"{stats['blocked']} blocks) in {elapsed:.0f}s, {rate:.0f} rows/hour with {tabs} tabs")
+    return stats
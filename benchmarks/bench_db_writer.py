@@ -0,0 +1,94 @@
+"""
+Benchmark: rows/s committed by the old per-row commits (save_to_database + update_progress,
+each with its own commit, rollback journal) against db_writer.DatabaseWriter (WAL, batched).
+
+    python benchmarks/bench_db_writer.py [--rows 2000] [--threads 4]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import setup_database, save_to_database
+from db_writer import DatabaseWriter
+from person_record import PersonRecord
+
+SAMPLE = PersonRecord('John A Smith', '7 Rocky Neck Ave', ['(978) 555-0142', '(617) 555-0199'],
+                      ['john.smith66@example.com'], 'Record found', '10.0.0.1:8000:user:pass')
+
+def update_progress(conn, row_index, input_file):
+    """The old append-only progress write, one row and one commit per call."""
+    conn.execute("INSERT INTO scraping_progress (last_processed_row, input_file) VALUES (?, ?)", (row_index, input_file))
+    conn.commit()
+
+def bench_per_row(db_path, rows, threads):
+    conn = setup_database(db_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.close()
+    lock = threading.Lock()
+
+    def worker(ids):
+        # One connection per worker; writes are serialised with a lock because concurrent
+        # rollback-journal writers otherwise fail with 'database is locked'
+        conn = sqlite3.connect(db_path, timeout=60)
+        for row_id in ids:
+            with lock:
+                save_to_database(conn, row_id, SAMPLE)
+                update_progress(conn, row_id, 'bench.csv')
+        conn.close()
+
+    return run_threads(worker, rows, threads)
+
+def bench_writer(db_path, rows, threads):
+    writer = DatabaseWriter(db_path)
+    writer.start()
+
+    def worker(ids):
+        for row_id in ids:
+            writer.save(row_id, SAMPLE)
+            writer.progress(row_id, 'bench.csv')
+
+    elapsed = run_threads(worker, rows, threads, finish=writer.close)
+    return elapsed
+
+def run_threads(worker, rows, threads, finish=None):
+    chunks = [list(range(i, rows, threads)) for i in range(threads)]
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if finish:
+        finish()
+    return time.perf_counter() - started
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM scraped_data").fetchone()[0]
+    conn.close()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, bench in (('per-row commits', bench_per_row), ('batched WAL writer', bench_writer)):
+            db_path = os.path.join(tmp, label.replace(' ', '_') + '.db')
+            elapsed = bench(db_path, args.rows, args.threads)
+            committed = count_rows(db_path)
+            print(f"{label:20} {committed} rows in {elapsed:6.2f}s  {committed / elapsed:9.0f} rows/s")
+
+if __name__ == '__main__':
+    main()
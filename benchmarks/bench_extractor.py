@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: extractor.extract_person_details against the previous regex-based
+cap.extract_data_from_text on saved details-page text.
+
+    python benchmarks/bench_extractor.py [--repeat 2000]
+"""
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import extract_person_details
+from exporter import RESULT_COLUMNS, flatten
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def legacy_extract_data_from_text(text, current_proxy):
+    """The extraction as it was in cap.py before extractor.py, kept here for comparison."""
+    data = {
+        'TPS Verified Name': '', 'TPS Address': '',
+        'Phone 1': '', 'Phone 2': '', 'Phone 3': '', 'Phone 4': '',
+        'Email 1': '', 'Email 2': '', 'Email 3': '',
+        'Remarks': 'Record found', 'Used Proxy': current_proxy
+    }
+    name_match = re.search(r'^([^,]+),', text.strip())
+    if name_match:
+        data['TPS Verified Name'] = name_match.group(1).strip()
+    current_address_pattern = r'Current Address.*?This is the most recently reported address.*?\n\n([^\n]+)'
+    address_match = re.search(current_address_pattern, text, re.DOTALL)
+    if address_match:
+        data['TPS Address'] = re.sub(r'\$.*', '', address_match.group(1).strip()).strip()
+    phone_section_pattern = r'(Phone Numbers[\s\S]*?Includes the current and past phone numbers[\s\S]*?)([\s\S]*?)(?=\s*Email Addresses|\s*Background Report|$)'
+    phone_section_match = re.search(phone_section_pattern, text, re.DOTALL)
+    if phone_section_match:
+        phone_matches = re.findall(r'\((\d{3})\) (\d{3})-(\d{4}) - Wireless', phone_section_match.group(2))
+        for i, phone_match in enumerate(phone_matches[:4]):
+            data[f'Phone {i + 1}'] = f"({phone_match[0]}) {phone_match[1]}-{phone_match[2]}"
+    email_section_pattern = r'(Email Addresses[\s\S]*?Includes all known email addresses[\s\S]*?)([\s\S]*?)(?=\s*Current Address Property Details|$)'
+    email_section_match = re.search(email_section_pattern, text, re.DOTALL)
+    if email_section_match:
+        email_matches = re.findall(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', email_section_match.group(2))
+        for i, email in enumerate(email_matches[:3]):
+            data[f'Email {i + 1}'] = email
+    return data
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'details_text_*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            fixtures[os.path.basename(path)] = f.read()
+    # No section terminators and a long run of address-like characters: the worst case
+    # for the lazy [\s\S]*? sections and the email pattern
+    fixtures['pathological (generated)'] = (
+        'Name, x\nPhone Numbers\nIncludes the current and past phone numbers\n'
+        + ('a.' * 20000) + '\nEmail Addresses\nIncludes all known email addresses\n' + ('b' * 40000)
+    )
+    return fixtures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'fixture':32} {'chars':>8} {'legacy us':>11} {'new us':>9} {'speedup':>8}  same output")
+    for name, text in load_fixtures().items():
+        repeat = args.repeat if len(text) < 20000 else max(1, args.repeat // 100)
+        legacy = timeit.timeit(lambda: legacy_extract_data_from_text(text, 'proxy'), number=repeat) / repeat
+        new = timeit.timeit(lambda: extract_person_details(text, 'proxy'), number=repeat) / repeat
+        # Records keep every phone and email; compare the columns the legacy dict had room for
+        legacy_row = tuple(legacy_extract_data_from_text(text, 'proxy')[column] for column in RESULT_COLUMNS)
+        same = legacy_row == flatten(extract_person_details(text, 'proxy'))
+        print(f"{name:32} {len(text):>8} {legacy * 1e6:>11.1f} {new * 1e6:>9.1f} {legacy / new:>7.1f}x  {same}")
+
+if __name__ == '__main__':
+    main()
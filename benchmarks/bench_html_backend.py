@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: per-page parse time of each installed html_backend against the old
+BeautifulSoup(html, 'html.parser').get_text() over the whole page, on the recorded
+fixture pages. Real pages carry far more markup than the fixtures (navigation, ads,
+inline scripts), so each page is also measured padded with --pad-kb of such filler.
+
+Checks that every backend classifies every page and extracts the details page the same
+way as the old full-text path.
+
+    python benchmarks/bench_html_backend.py [--repeat 200] [--pad-kb 150]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import html_backend
+from extractor import extract_person_details
+from page_state import PageSnapshot
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+FILLER_BLOCK = """
+<nav class="navbar"><ul>%s</ul></nav>
+<script>window.__data = {"items": [%s], "ads": {"slot": "top", "refresh": 30}};</script>
+<div class="footer-links"><div class="col">%s</div></div>
+"""
+
+def filler(kb):
+    """About `kb` KB of markup that is neither a result, a details section nor a challenge."""
+    links = ''.join(f'<li><a href="/state/{i}">People in state {i}</a></li>' for i in range(20))
+    items = ', '.join(f'{{"id": {i}, "label": "item {i}"}}' for i in range(20))
+    footer = ''.join(f'<a class="small" href="/faq/{i}">Frequently asked question {i}</a><br>' for i in range(20))
+    block = FILLER_BLOCK % (links, items, footer)
+    return block * max(1, kb * 1024 // len(block)) if kb else ''
+
+def padded(html, kb):
+    pad = filler(kb)
+    # Half before the content, half after, the way real pages wrap it in header and footer
+    half = len(pad) // 2
+    return html.replace('<body>', '<body>' + pad[:half], 1).replace('</body>', pad[half:] + '</body>', 1)
+
+def legacy_snapshot(html):
+    snapshot = PageSnapshot(html)
+    snapshot._text = BeautifulSoup(html, 'html.parser').get_text()
+    return snapshot
+
+def per_page_ms(fn, pages, repeat):
+    """Median over `repeat` rounds of the mean time per page, in ms."""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in pages:
+            fn(html)
+        rounds.append((time.perf_counter() - started) / len(pages) * 1000)
+    return statistics.median(rounds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--pad-kb', type=int, default=150)
+    args = parser.parse_args()
+    fixtures = {os.path.basename(path): open(path, encoding='utf-8').read()
+                for path in sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))}
+    sets = {'fixtures': fixtures, f'+{args.pad_kb} KB': {n: padded(h, args.pad_kb) for n, h in fixtures.items()}}
+    expected = {label: {n: legacy_snapshot(h).kind for n, h in pages.items()} for label, pages in sets.items()}
+    details = extract_person_details(legacy_snapshot(fixtures['details.html']).text, None)
+
+    sizes = ', '.join(f"{label} {statistics.mean(len(h) for h in pages.values()) / 1024:.1f} KB"
+                      for label, pages in sets.items())
+    print(f"{len(fixtures)} pages, average size: {sizes}\n")
+    print(f"{'backend':28} " + ' '.join(f"{label + ' ms/page':>20}" for label in sets) + f" {'same results':>13}")
+    repeat_for = {label: args.repeat if label == 'fixtures' else max(1, args.repeat // 20) for label in sets}
+    row = [f"{per_page_ms(lambda h: legacy_snapshot(h).kind, list(pages.values()), repeat_for[label]):>20.3f}"
+           for label, pages in sets.items()]
+    print(f"{'html.parser, whole page':28} " + ' '.join(row) + f" {'-':>13}")
+    for name in html_backend.available_backends():
+        html_backend.configure(name)
+        same = all(PageSnapshot(h).kind == expected[label][n] for label, pages in sets.items() for n, h in pages.items())
+        same = same and extract_person_details(PageSnapshot(sets[f'+{args.pad_kb} KB']['details.html']).text, None) == details
+        row = [f"{per_page_ms(lambda h: PageSnapshot(h).kind, list(pages.values()), repeat_for[label]):>20.3f}"
+               for label, pages in sets.items()]
+        print(f"{name + ', relevant subtrees':28} " + ' '.join(row) + f" {str(same):>13}")
+    html_backend.configure()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Harness: the lease queue of job_queue.py with several worker processes on this host,
+offline. The coordinator (this process) enqueues the input in ranges and collects the
+results; each worker process claims ranges and looks every row up with
+cap.scrape_person_data on a ReplaySB (fake_browser.py) against replay_server.py,
+renewing its lease as it goes. One worker dies partway through a lease to show that
+the range is handed to another worker once the lease expires.
+
+Checks that every input row ends up with exactly one result and reports rows/s,
+ranges per worker and how many ranges were reassigned.
+
+    python benchmarks/bench_job_queue.py [--input massa.csv] [--rows 1000] [--workers 4]
+                                         [--lease-rows 25] [--lease-seconds 3] [--kill-after 10]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_browser import ReplaySB
+from replay_server import start_replay_server
+from bench_pipeline import SCENARIO_MIX, MAX_PROXY_USES, ScaledClock
+
+def worker_main(queue_path, base_url, worker_id, lease_seconds, sleep_scale, kill_after, report):
+    """One worker host: claim ranges until the queue is finished, as cap.run_queue_worker does."""
+    workdir = tempfile.mkdtemp(prefix=f'bench_job_queue_{worker_id}_')
+    # cap.py logs to scraper.log in the working directory as soon as it is imported
+    os.chdir(workdir)
+    import cap
+    import captcha_solver
+    import readiness
+    import rate_limiter
+    from database import empty_record
+    from job_queue import JobQueue
+
+    logging.disable(logging.CRITICAL)
+    rate_limiter.configure(0, 1, 0, 1)
+    clock = ScaledClock(sleep_scale)
+    for module in (cap, captcha_solver, readiness):
+        module.time = clock
+    queue = JobQueue(queue_path, lease_seconds)
+    ranges = rows = lookups = 0
+    sb, uses = None, 0
+    while True:
+        lease = queue.claim(worker_id)
+        if lease is None:
+            if queue.is_finished():
+                break
+            time.sleep(0.2)
+            continue
+        results = {}
+        renewed = time.time()
+        for row_id, name, address in lease.rows:
+            if kill_after and rows >= kill_after:
+                # Crash without releasing the lease: it has to expire before anyone else gets the range
+                os._exit(1)
+            if sb is None or uses >= MAX_PROXY_USES:
+                sb, uses = ReplaySB(base_url), 0
+            sb.scenario = SCENARIO_MIX[lookups % len(SCENARIO_MIX)]
+            proxy = f'10.{worker_id}.{lookups // MAX_PROXY_USES % 256}.1:8000:user:pass'
+            try:
+                data, is_blocked = cap.scrape_person_data(sb, str(name), str(address), proxy, None, {})
+            except Exception:
+                data, is_blocked = None, False
+            uses += 1
+            lookups += 1
+            rows += 1
+            if is_blocked:
+                sb = None
+            results[row_id] = (data or empty_record('Failed after 1 retries', proxy), data is not None)
+            if time.time() - renewed > lease_seconds / 3:
+                queue.renew(lease)
+                renewed = time.time()
+        queue.complete(lease, results, str(worker_id))
+        ranges += 1
+    queue.close()
+    report.put((worker_id, ranges, rows))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=os.path.join(ROOT, 'massa.csv'))
+    parser.add_argument('--rows', type=int, default=1000, help='Only the first N input rows (0: all)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--lease-rows', type=int, default=25)
+    parser.add_argument('--lease-seconds', type=float, default=3)
+    parser.add_argument('--kill-after', type=int, default=10,
+                        help='Rows worker 1 looks up before it dies mid-lease (0: no crash)')
+    parser.add_argument('--sleep-scale', type=float, default=0.001)
+    args = parser.parse_args()
+    input_file = os.path.abspath(args.input)
+    workdir = tempfile.mkdtemp(prefix='bench_job_queue_')
+    os.chdir(workdir)
+    from input_reader import iter_pending_rows
+    from job_queue import JobQueue
+
+    server, base_url = start_replay_server()
+    context = multiprocessing.get_context('fork')
+    report = context.Queue()
+    try:
+        queue_path = os.path.join(workdir, 'queue.db')
+        queue = JobQueue(queue_path, args.lease_seconds)
+        expected = []
+        for row in iter_pending_rows(input_file):
+            if args.rows and len(expected) >= args.rows:
+                break
+            expected.append(row)
+        started = time.perf_counter()
+        ranges = queue.enqueue(input_file, expected, args.lease_rows)
+        processes = [context.Process(target=worker_main,
+                                     args=(queue_path, base_url, i + 1, args.lease_seconds, args.sleep_scale,
+                                           args.kill_after if i == 0 else 0, report))
+                     for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        results = {}
+        duplicates = 0
+        while True:
+            finished = queue.is_finished(input_file)
+            taken = queue.pending_results(input_file)
+            for row_id, record, success in taken:
+                duplicates += row_id in results
+                results[row_id] = (record, success)
+            queue.mark_imported(input_file, [row_id for row_id, _, _ in taken])
+            if finished:
+                break
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        reassigned = queue.conn.execute("SELECT COUNT(*) FROM job_ranges WHERE attempts > 1").fetchone()[0]
+        given_up = queue.given_up_rows(input_file)
+        queue.close()
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    workers = sorted(report.get() for _ in range(sum(p.exitcode == 0 for p in processes)))
+    for worker_id, worker_ranges, worker_rows in workers:
+        print(f"worker {worker_id}: {worker_ranges} ranges, {worker_rows} rows")
+    for i, process in enumerate(processes):
+        if process.exitcode != 0:
+            print(f"worker {i + 1}: died (exit code {process.exitcode})")
+    missing = {row_id for row_id, _, _ in expected} - set(results)
+    found = sum(record.is_positive() for record, _ in results.values())
+    print(f"\n{len(results)} of {len(expected)} rows in {ranges} ranges of {args.lease_rows} "
+          f"({found} found) in {elapsed:.1f}s, {len(results) / elapsed:.1f} rows/s with {args.workers} workers")
+    print(f"{reassigned} ranges reassigned after an expired lease, {len(given_up)} rows given up, "
+          f"{duplicates} duplicate results, {len(missing)} rows missing")
+    if missing or duplicates or given_up:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
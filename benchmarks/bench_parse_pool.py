@@ -0,0 +1,172 @@
+"""
+Benchmark: browser idle time with parsing inline vs in parse_pool worker processes.
+
+Several threads each drive a ReplaySB (fake_browser.py) through cap.scrape_person_data
+against replay_server.py, as worker_pool.py does with real browsers. Every call into
+the browser is timed; the rest of a lookup is time the browser sits idle while its
+thread parses, classifies, extracts or waits for the GIL. The fake browser's own page
+work (signals, element lookups) is memoised per page, since in a real run Chrome does
+it outside this process.
+
+    python benchmarks/bench_parse_pool.py [--threads 4] [--processes 0,2] [--rows 400] [--latency-ms 30]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_browser import ReplaySB
+from replay_server import start_replay_server
+from bench_pipeline import SCENARIO_MIX, MAX_PROXY_USES, ScaledClock
+from readiness import PAGE_SIGNALS_SCRIPT
+
+class TimedSB(ReplaySB):
+    """ReplaySB that sums the time spent inside browser calls and memoises its own parsing."""
+    _memo = {}
+    _memo_lock = threading.Lock()
+
+    def __init__(self, base_url, scenario=None):
+        super().__init__(base_url, scenario)
+        self.busy = 0.0
+        self._depth = 0
+
+    def _cached(self, key, compute):
+        with self._memo_lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        with self._memo_lock:
+            self._memo[key] = value
+        return value
+
+    def kind(self):
+        return self._cached(('kind', self.html), lambda: ReplaySB.kind(self))
+
+    def execute_script(self, script):
+        if script == PAGE_SIGNALS_SCRIPT or 'document.evaluate' in script:
+            source = self.get_page_source()
+            result = self._cached((script, source), lambda: ReplaySB.execute_script(self, script))
+            self.scripts += 1
+            return list(result) if isinstance(result, list) else result
+        return ReplaySB.execute_script(self, script)
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name.startswith('_') or name in ('kind', 'solve_challenge') or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            # Only the outermost call counts: execute_script may open a page itself
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self.busy += time.perf_counter() - started
+        return timed
+
+def run(cap, groups, base_url, threads):
+    """Look up every group with `threads` browser threads; returns per-lookup (wall, busy) samples."""
+    samples = []
+    lock = threading.Lock()
+    queue = list(enumerate(groups))
+
+    def worker(worker_id):
+        sb, uses = None, 0
+        while True:
+            with lock:
+                if not queue:
+                    return
+                number, (row_ids, name, address) = queue.pop()
+            if sb is None or uses >= MAX_PROXY_USES:
+                sb, uses = TimedSB(base_url), 0
+            sb.scenario = SCENARIO_MIX[number % len(SCENARIO_MIX)]
+            proxy = f'10.{worker_id}.{number // MAX_PROXY_USES % 256}.1:8000:user:pass'
+            busy_before = sb.busy
+            started = time.perf_counter()
+            try:
+                data, is_blocked = cap.scrape_person_data(sb, str(name), str(address), proxy, None, {})
+            except Exception:
+                is_blocked = False
+            wall = time.perf_counter() - started
+            with lock:
+                samples.append((wall, sb.busy - busy_before))
+            uses += 1
+            if is_blocked:
+                sb = None
+
+    pool = [threading.Thread(target=worker, args=(i + 1,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=os.path.join(ROOT, 'massa.csv'))
+    parser.add_argument('--rows', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--processes', default='0,2', help='Comma-separated parse_pool sizes to compare (0: inline)')
+    parser.add_argument('--latency-ms', type=int, default=30, help='Replay server delay per page, standing in for the network')
+    parser.add_argument('--sleep-scale', type=float, default=0.001)
+    args = parser.parse_args()
+    input_file = os.path.abspath(args.input)
+    workdir = tempfile.mkdtemp(prefix='bench_parse_pool_')
+    # cap.py logs to scraper.log in the working directory as soon as it is imported
+    os.chdir(workdir)
+    import cap
+    import captcha_solver
+    import readiness
+    import rate_limiter
+    import parse_pool
+    from input_reader import iter_pending_rows
+    from lookup_cache import group_duplicate_rows
+
+    logging.disable(logging.CRITICAL)
+    rate_limiter.configure(0, 1, 0, 1)
+    clock = ScaledClock(args.sleep_scale)
+    for module in (cap, captcha_solver, readiness):
+        module.time = clock
+    server, base_url = start_replay_server(latency_ms=args.latency_ms)
+    print(f"{os.cpu_count()} CPUs, {args.threads} browser threads, {args.latency_ms} ms per page\n")
+    print(f"{'parsing':>12} {'lookups':>8} {'rows/s':>8} {'idle p50 ms':>12} {'idle p95 ms':>12} "
+          f"{'idle share':>11} {'parse wait ms':>14}")
+    try:
+        groups = []
+        for group in group_duplicate_rows(iter_pending_rows(input_file)):
+            if len(groups) >= args.rows:
+                break
+            groups.append(group)
+        for processes in (int(p) for p in args.processes.split(',')):
+            pool = parse_pool.configure(processes)
+            if processes:
+                # Start the worker processes before the clock runs
+                pool.snapshot('<html></html>')
+            pool.pages, pool.wait_seconds = 0, 0.0
+            started = time.perf_counter()
+            samples = run(cap, groups, base_url, args.threads)
+            elapsed = time.perf_counter() - started
+            idle = sorted(wall - busy for wall, busy in samples)
+            pick = lambda q: idle[min(len(idle) - 1, int(q * len(idle)))] * 1000
+            share = sum(idle) / sum(wall for wall, _ in samples)
+            label = f"{processes} procs" if processes else 'inline'
+            print(f"{label:>12} {len(samples):>8} {len(samples) / elapsed:>8.1f} {pick(0.5):>12.2f} {pick(0.95):>12.2f} "
+                  f"{share:>11.1%} {pool.wait_seconds / max(pool.pages, 1) * 1000:>14.2f}")
+        parse_pool.configure(0)
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
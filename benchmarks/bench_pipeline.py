@@ -0,0 +1,190 @@
+"""
+Benchmark: the cap.py pipeline end to end on an input file, offline. Every lookup runs
+cap.scrape_person_data on a ReplaySB (fake_browser.py) against replay_server.py, over a
+fixed mix of results, not-found, consent, press & hold, click captcha and block pages;
+results go through save_to_database and the run ends with export_to_csv.
+
+Reports latency percentiles per stage, lookups/s and rows/s, and peak memory. Waits
+inside the pipeline (captcha holds, consent pauses, readiness polls) run on a clock
+scaled by --sleep-scale, so the numbers are dominated by parsing, extraction and the
+database rather than by sleeping.
+
+    python benchmarks/bench_pipeline.py [--input massa.csv] [--rows N] [--latency-ms 0] [--sleep-scale 0.001]
+"""
+import argparse
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_browser import ReplaySB
+from replay_server import start_replay_server
+
+# Pages served per 20 lookups, picked by the replay server's 'scenario' parameter
+SCENARIO_MIX = ['results'] * 14 + ['nobody'] * 2 + ['consent', 'hold', 'moment', 'blocked']
+# Lookups per browser session before it is replaced, as cap.py rotates proxies
+MAX_PROXY_USES = 15
+COMMIT_EVERY = 100
+
+class ScaledClock:
+    """
+    Stands in for the `time` module of the pipeline's modules: sleep() only sleeps
+    `scale` of the time asked for, and time() runs ahead by the rest, so deadlines
+    computed from time() still expire after the same number of (scaled) sleeps.
+    """
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.skipped = 0.0
+
+    def sleep(self, seconds):
+        time.sleep(seconds * self.scale)
+        self.skipped += seconds * (1 - self.scale)
+
+    def time(self):
+        return time.time() + self.skipped
+
+    def monotonic(self):
+        return time.monotonic() + self.skipped
+
+    def perf_counter(self):
+        return time.perf_counter() + self.skipped
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return timed
+
+    def report(self):
+        print(f"{'stage':26} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total s':>9}")
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            print(f"{stage:26} {len(ordered):>7} {pick(0.50):>9.3f} {pick(0.95):>9.3f} {pick(0.99):>9.3f} "
+                  f"{ordered[-1] * 1000:>9.3f} {sum(ordered):>9.2f}")
+
+def run(cap, groups, base_url, conn, timer):
+    """Look up every (row_ids, name, address) group the way cap.main does, saving every row."""
+    from database import save_to_database, empty_record
+    from exporter import flatten
+
+    scrape = timer.wrap('scrape_person_data', cap.scrape_person_data)
+    detect = timer.wrap('detect_if_blocked', cap.detect_if_blocked)
+    flat = timer.wrap('flatten', flatten)
+    save = timer.wrap('save_to_database', save_to_database)
+    stats = {'lookups': 0, 'rows': 0, 'blocked': 0, 'found': 0, 'failed': 0}
+    sb, uses, unsaved = None, 0, 0
+    for number, (row_ids, name, address) in enumerate(groups):
+        if sb is None or uses >= MAX_PROXY_USES:
+            sb, uses = ReplaySB(base_url), 0
+        sb.scenario = SCENARIO_MIX[number % len(SCENARIO_MIX)]
+        proxy = f'10.0.{number // MAX_PROXY_USES % 256}.1:8000:user:pass'
+        try:
+            data, is_blocked = scrape(sb, str(name), str(address), proxy, None, {})
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"Lookup failed: {e}")
+            data, is_blocked = None, False
+        detect(sb)
+        uses += 1
+        stats['lookups'] += 1
+        if is_blocked:
+            stats['blocked'] += 1
+            sb = None
+        if data is None:
+            stats['failed'] += 1
+            data = empty_record('Failed after 1 retries', proxy)
+        elif data.is_positive():
+            stats['found'] += 1
+        flat(data)
+        for row_id in row_ids:
+            save(conn, row_id, data, commit=False)
+            unsaved += 1
+            stats['rows'] += 1
+        if unsaved >= COMMIT_EVERY:
+            timer.wrap('commit', conn.commit)()
+            unsaved = 0
+    conn.commit()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=os.path.join(ROOT, 'massa.csv'))
+    parser.add_argument('--rows', type=int, default=0, help='Only the first N input rows (default: all)')
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--sleep-scale', type=float, default=0.001)
+    args = parser.parse_args()
+    input_file = os.path.abspath(args.input)
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    # cap.py logs to scraper.log in the working directory as soon as it is imported
+    os.chdir(workdir)
+    import cap
+    import captcha_solver
+    import readiness
+    import rate_limiter
+    from database import setup_database
+    from exporter import export_to_csv
+    from input_reader import iter_pending_rows
+    from lookup_cache import group_duplicate_rows
+
+    logging.disable(logging.CRITICAL)
+    rate_limiter.configure(0, 1, 0, 1)
+    clock = ScaledClock(args.sleep_scale)
+    for module in (cap, captcha_solver, readiness):
+        module.time = clock
+    server, base_url = start_replay_server(latency_ms=args.latency_ms)
+    try:
+        if args.rows:
+            import pandas as pd
+            trimmed = os.path.join(workdir, 'input.csv')
+            pd.read_csv(input_file, nrows=args.rows, dtype=str, keep_default_na=False).to_csv(trimmed, index=False)
+            input_file = trimmed
+        timer = StageTimer()
+        # Stages inside scrape_person_data, looked up as cap module globals at call time
+        cap.handle_captchas = timer.wrap('handle_captchas', cap.handle_captchas)
+        cap.extract_data_from_text = timer.wrap('extract_data_from_text', cap.extract_data_from_text)
+        started = time.perf_counter()
+        groups = timer.wrap('read + group input', lambda: group_duplicate_rows(iter_pending_rows(input_file)))()
+        conn = setup_database(os.path.join(workdir, 'bench.db'))
+        stats = run(cap, groups, base_url, conn, timer)
+        lookups_done = time.perf_counter()
+        tracemalloc.start()
+        timer.wrap('export_to_csv', export_to_csv)(conn, input_file, os.path.join(workdir, 'output.csv'))
+        export_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        elapsed = time.perf_counter() - started
+        conn.close()
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timer.report()
+    lookup_seconds = lookups_done - started
+    print(f"\n{stats['lookups']} lookups for {stats['rows']} rows ({stats['found']} found, {stats['blocked']} blocked, "
+          f"{stats['failed']} failed) in {elapsed:.1f}s")
+    print(f"{stats['lookups'] / lookup_seconds:.1f} lookups/s, {stats['rows'] / elapsed:.1f} rows/s end to end; "
+          f"waits ran at {args.sleep_scale}x ({clock.skipped:.0f}s of sleeping skipped)")
+    # ru_maxrss is in KB on Linux
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB, "
+          f"export peak {export_peak / 1024 / 1024:.1f} MB traced")
+
+if __name__ == '__main__':
+    main()
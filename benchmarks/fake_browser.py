@@ -0,0 +1,270 @@
+"""
+Offline stand-ins for a browser, for running the scrape pipeline against replay_server.py.
+
+ReplayTab implements the tab interface async_scraper expects (open, signals, content,
+click, press_and_hold, close) with plain HTTP requests: no JavaScript runs, signals come
+from classifying the fetched page, and holding the press & hold captcha (or clicking the
+click captcha) sets the 'px_cleared' ('cf_cleared') cookie the replay server looks for.
+
+ReplaySB does the same for the parts of seleniumbase's `sb` that cap.scrape_person_data
+uses: navigation, page source, cookies, the handful of scripts cap.py, readiness.py and
+captcha_solver.py run (answered from the fetched page), and CDP mouse events. Once in CDP
+mode it rejects scripts the way seleniumbase's CDP-mode execute_script would.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_fetch import find_details_link
+from page_state import PageSnapshot, RESULT_COUNT_RE, UNKNOWN, PRESS_HOLD, CLICK_CAPTCHA
+from readiness import PAGE_SIGNALS_SCRIPT
+
+CONSENT_BUTTON_SELECTOR = 'button.fc-cta-consent'
+
+FUNCTION_HEAD_RE = re.compile(r'(\bfunction\s*[\w$]*\s*\([^()]*\)|=>)\s*$')
+RETURN_RE = re.compile(r'return\b')
+
+def cdp_expression(script):
+    """
+    What seleniumbase's CDP-mode execute_script sends to Runtime.evaluate: the script
+    as a top-level script, with a `return` stripped from its last line only.
+    """
+    lines = script.strip().split('\n')
+    if lines[-1].strip().startswith('return '):
+        lines[-1] = lines[-1].strip()[len('return '):]
+    return '\n'.join(lines)
+
+def check_top_level_returns(expression):
+    """
+    Raise the SyntaxError Runtime.evaluate gives for a `return` outside any function.
+    Strings are skipped; regex literals are not, which is fine for braces that balance.
+    """
+    blocks = []  # per open brace: whether it is a function body
+    i = 0
+    while i < len(expression):
+        c = expression[i]
+        if c in '\'"`':
+            end = i + 1
+            while end < len(expression) and expression[end] != c:
+                end += 2 if expression[end] == '\\' else 1
+            i = end + 1
+            continue
+        if c == '{':
+            blocks.append(bool(FUNCTION_HEAD_RE.search(expression, 0, i)))
+        elif c == '}':
+            if blocks:
+                blocks.pop()
+        elif (RETURN_RE.match(expression, i) and not any(blocks)
+              and (i == 0 or not (expression[i - 1].isalnum() or expression[i - 1] in '_$'))):
+            raise Exception("SyntaxError: Illegal return statement")
+        i += 1
+
+def fetch_page(url, cookies):
+    request = urllib.request.Request(url)
+    if cookies:
+        request.add_header('Cookie', '; '.join(f'{k}={v}' for k, v in cookies.items()))
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        # Challenge and block pages are served as 403, like the real site
+        return e.read().decode('utf-8')
+
+def page_signals(html):
+    """What readiness.PAGE_SIGNALS_SCRIPT would return for this page."""
+    snapshot = PageSnapshot(html)
+    signals = [] if snapshot.kind == UNKNOWN else [snapshot.kind]
+    if snapshot.has_consent:
+        signals.append('consent')
+    return signals
+
+class ReplayTab:
+    def __init__(self, cookies=None, hold_scale=1.0):
+        # Tabs of one fake browser share its cookie jar, like real ones do
+        self.cookies = cookies if cookies is not None else {}
+        self.hold_scale = hold_scale
+        self.url = None
+        self.html = ''
+        self._signals = []
+        self.opened = 0
+
+    async def _load(self, url):
+        self.url = url
+        self.opened += 1
+        self.html = await asyncio.to_thread(fetch_page, url, self.cookies)
+        self._signals = await asyncio.to_thread(page_signals, self.html)
+
+    async def open(self, url):
+        await self._load(url)
+
+    async def signals(self):
+        return list(self._signals)
+
+    async def content(self):
+        return self.html
+
+    async def click(self, selector):
+        if selector == CONSENT_BUTTON_SELECTOR and 'consent' in self._signals:
+            self.html = self.html.replace('fc-dialog', 'fc-dialog-dismissed')
+            self._signals.remove('consent')
+            return True
+        if CLICK_CAPTCHA in self._signals:
+            self.cookies['cf_cleared'] = '1'
+            await self._load(self.url)
+            return True
+        return False
+
+    async def press_and_hold(self, selector, seconds):
+        if PRESS_HOLD not in self._signals:
+            return False
+        await asyncio.sleep(seconds * self.hold_scale)
+        self.cookies['px_cleared'] = '1'
+        await self._load(self.url)
+        return True
+
+    async def close(self):
+        pass
+
+class ReplayBrowserPool:
+    """open_tab() for async_scraper.run_async_lookups: fake proxies, one cookie jar each."""
+
+    def __init__(self, proxies=('127.0.0.1:1:fake:fake',), hold_scale=1.0):
+        self.proxies = list(proxies)
+        self.hold_scale = hold_scale
+        self.jars = {}
+        self.tabs = []
+        self._next = 0
+
+    async def open_tab(self, blocked_proxy=None):
+        if blocked_proxy in self.proxies:
+            self.proxies.remove(blocked_proxy)
+        if not self.proxies:
+            return None, None
+        proxy = self.proxies[self._next % len(self.proxies)]
+        self._next += 1
+        tab = ReplayTab(self.jars.setdefault(proxy, {}), self.hold_scale)
+        self.tabs.append(tab)
+        return tab, proxy
+
+# Where a matched element sits in the fake viewport: [left, top, width, height]
+ELEMENT_BOX = [480, 300, 310, 100]
+
+class ReplayDriver:
+    """sb.driver: not in CDP mode, so captcha_solver sends mouse events through execute_cdp_cmd."""
+    _is_using_cdp = False
+
+    def __init__(self, sb):
+        self.sb = sb
+        self.pressed_at = None
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd != 'Input.dispatchMouseEvent':
+            return {}
+        if params['type'] == 'mousePressed':
+            self.pressed_at = time.time()
+        elif params['type'] == 'mouseReleased' and self.pressed_at is not None:
+            self.pressed_at = None
+            self.sb.solve_challenge()
+        return {}
+
+class ReplaySB:
+    """
+    A stand-in for one seleniumbase session on one proxy: pages come from the replay
+    server at base_url whatever host the caller opens, the cookie jar lives as long as
+    the object, and loads/scripts are counted. `scenario` is passed on to the server
+    with every search to pick the page it answers with.
+    """
+
+    def __init__(self, base_url, scenario=None):
+        self.base_url = base_url
+        self.scenario = scenario
+        self.driver = ReplayDriver(self)
+        self.cookies = {}
+        self.url = None
+        self.html = ''
+        self.consent_dismissed = False
+        self.cdp_mode = False
+        self.loads = 0
+        self.scripts = 0
+
+    def open(self, url):
+        parts = urlsplit(url)
+        url = f"{self.base_url}{parts.path}?{parts.query}" if parts.query else f"{self.base_url}{parts.path}"
+        if self.scenario and parts.path == '/results':
+            url += f"&scenario={self.scenario}"
+        self._load(url)
+
+    def _load(self, url):
+        self.url = url
+        self.loads += 1
+        self.html = fetch_page(url, self.cookies)
+        self.consent_dismissed = False
+
+    def activate_cdp_mode(self, url):
+        self.cdp_mode = True
+        self.open(url)
+
+    def get_page_source(self):
+        if self.consent_dismissed:
+            return self.html.replace('fc-dialog', 'fc-dismissed')
+        return self.html
+
+    def get_cookies(self):
+        return [{'name': name, 'value': value} for name, value in self.cookies.items()]
+
+    def kind(self):
+        return PageSnapshot(self.html).kind
+
+    def solve_challenge(self):
+        kind = self.kind()
+        if kind == PRESS_HOLD:
+            self.cookies['px_cleared'] = '1'
+        elif kind == CLICK_CAPTCHA:
+            self.cookies['cf_cleared'] = '1'
+        else:
+            return
+        self._load(self.url)
+
+    def is_element_visible(self, selector):
+        if selector == '.fc-dialog':
+            return 'fc-dialog' in self.get_page_source()
+        return False
+
+    def click(self, selector):
+        if selector == CONSENT_BUTTON_SELECTOR:
+            self.consent_dismissed = True
+
+    def execute_script(self, script):
+        self.scripts += 1
+        if self.cdp_mode:
+            check_top_level_returns(cdp_expression(script))
+        if script == PAGE_SIGNALS_SCRIPT:
+            return page_signals(self.get_page_source())
+        if 'getBoundingClientRect' in script:
+            # captcha_solver.ELEMENT_BOX_SCRIPT
+            kind = self.kind()
+            if ('#px-captcha' in script and kind == PRESS_HOLD) or ('cloudflare' in script and kind == CLICK_CAPTCHA):
+                return list(ELEMENT_BOX)
+            return None
+        if CONSENT_BUTTON_SELECTOR in script and '.click()' in script:
+            self.consent_dismissed = True
+            return None
+        if "').click()" in script:
+            # cap.scrape_person_data's click on the View Details button
+            link = find_details_link(self.html)
+            if link is None:
+                raise Exception("Cannot read properties of null (reading 'click')")
+            self.open(urljoin(self.url, link))
+            return None
+        if 'document.evaluate' in script and 'textContent' in script:
+            # The record count above the results
+            match = RESULT_COUNT_RE.search(PageSnapshot(self.html).text)
+            return match.group(0).strip() if match else None
+        return None
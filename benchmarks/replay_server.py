@@ -0,0 +1,94 @@
+"""
+Local stand-in for truepeoplesearch.com serving the recorded pages in fixtures/pages.
+
+The page served for /results depends on the searched name, so every path can be exercised:
+    name containing 'blocked'  -> blocked.html
+    name containing 'hold'     -> press_hold.html (results once the 'px_cleared' cookie is sent)
+    name containing 'moment'   -> click_captcha.html (results once the 'cf_cleared' cookie is sent)
+    name containing 'consent'  -> consent.html
+    name containing 'nobody'   -> not_found.html
+    anything else              -> results.html
+A 'scenario' query parameter, when present, is matched the same way instead of the name
+(the offline benchmarks use it to pick a page without editing real names).
+/find/person/<id> always serves details.html.
+
+    python benchmarks/replay_server.py [--port 8765] [--latency-ms 0]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import os
+import threading
+import time
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+def load_pages():
+    pages = {}
+    for filename in os.listdir(PAGES_DIR):
+        if filename.endswith('.html'):
+            with open(os.path.join(PAGES_DIR, filename), 'rb') as f:
+                pages[filename[:-5]] = f.read()
+    return pages
+
+def page_for_request(path, cookies):
+    parsed = urlparse(path)
+    if parsed.path.startswith('/find/person/'):
+        return 'details'
+    if parsed.path != '/results':
+        return None
+    query = parse_qs(parsed.query)
+    name = query.get('scenario', query.get('name', ['']))[0].lower()
+    if 'blocked' in name:
+        return 'blocked'
+    if 'hold' in name:
+        return 'results' if 'px_cleared' in cookies else 'press_hold'
+    if 'moment' in name:
+        return 'results' if 'cf_cleared' in cookies else 'click_captcha'
+    if 'consent' in name:
+        return 'consent'
+    if 'nobody' in name:
+        return 'not_found'
+    return 'results'
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    pages = {}
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        page = page_for_request(self.path, self.headers.get('Cookie', ''))
+        if page is None or page not in self.pages:
+            self.send_error(404)
+            return
+        body = self.pages[page]
+        self.send_response(403 if page in ('blocked', 'press_hold') else 200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_replay_server(port=0, latency_ms=0):
+    """Start the server on a background thread and return (server, base_url)."""
+    handler = type('Handler', (ReplayHandler,), {'pages': load_pages(), 'latency': latency_ms / 1000.0})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='replay-server', daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve recorded TruePeopleSearch pages locally')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=int, default=0)
+    args = parser.parse_args()
+    server, base_url = start_replay_server(args.port, args.latency_ms)
+    print(f"Serving recorded pages at {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
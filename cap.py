@@ -1,14 +1,44 @@
-from seleniumbase import SB
-import pandas as pd
-import random
-import sqlite3
 import time
-import os
-from bs4 import BeautifulSoup
 import logging
-import pyautogui
-import re
-from datetime import datetime
+import argparse
+import functools
+
+from database import (
+    DB_PATH,
+    setup_database,
+    add_blocked_proxy,
+    empty_record,
+)
+from worker_pool import run_worker_pool
+from async_scraper import run_async_pool
+from proxy_scheduler import ProxyScheduler
+import rate_limiter
+from rate_limiter import throttle
+import metrics
+import parse_pool
+import retry_policy
+from retry_policy import note_failure
+from metrics import timed_phase, PACING, NAVIGATION, CAPTCHA, CONSENT, DETAILS_CLICK, EXTRACTION
+import captcha_solver
+from challenge_state import tracker as challenge_tracker, session_key, clearance_expiry
+from db_writer import DatabaseWriter
+from job_queue import JobQueue, LeaseCollector, QUEUE_PATH, DEFAULT_RANGE_SIZE, DEFAULT_LEASE_SECONDS, default_worker_id
+from checkpoint import Checkpoint, DONE, FAILED
+from input_reader import iter_pending_rows, count_input_rows
+from exporter import CsvExporter
+from session_manager import open_url
+from http_fetch import HttpFetcherPool
+from lookup_cache import (
+    DEFAULT_TTL_HOURS,
+    DEFAULT_NEGATIVE_TTL_HOURS,
+    CacheStats,
+    normalize_lookup_key,
+    group_duplicate_rows,
+    get_cached_result,
+    note_not_found,
+)
+from readiness import wait_for_page_state
+from page_state import BLOCKED, PRESS_HOLD, CLICK_CAPTCHA, NOT_FOUND, PRESS_HOLD_MARKER, result_count
 
 # Configure logging
 logging.basicConfig(
@@ -21,77 +51,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_database():
-    conn = sqlite3.connect('tps_data.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS scraped_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        input_row_id INTEGER,
-        tps_verified_name TEXT,
-        tps_address TEXT,
-        phone1 TEXT,
-        phone2 TEXT,
-        phone3 TEXT,
-        phone4 TEXT,
-        email1 TEXT,
-        email2 TEXT,
-        email3 TEXT,
-        remarks TEXT,
-        used_proxy TEXT
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS blocked_proxies (
-        proxy TEXT PRIMARY KEY,
-        blocked_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS scraping_progress (
-        id INTEGER PRIMARY KEY,
-        last_processed_row INTEGER,
-        input_file TEXT,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    conn.commit()
-    return conn
-
-def get_last_processed_row(conn, input_file):
-    cursor = conn.cursor()
-    cursor.execute("SELECT last_processed_row FROM scraping_progress WHERE input_file = ? ORDER BY timestamp DESC LIMIT 1", (input_file,))
-    result = cursor.fetchone()
-    if result:
-        return result[0]
-    return -1
-
-def update_progress(conn, row_index, input_file):
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO scraping_progress (last_processed_row, input_file) VALUES (?, ?)", 
-                  (row_index, input_file))
-    conn.commit()
+# Lookups between appends to the output CSV during a run
+EXPORT_EVERY = 25
+# Longest wait for a proxy to come out of cooldown before giving up
+MAX_COOLDOWN_WAIT = 600
+# Solve captchas with pyautogui on the real screen instead of CDP input events (--gui-captcha)
+use_gui_captcha = False
+# How often queue workers look for a free range, and the coordinator for results
+QUEUE_POLL_SECONDS = 5
 
 def address_to_url_conv(name, address):
     return f'https://www.truepeoplesearch.com/results?name={name.replace(" ", "%20")}&citystatezip={address.replace(" ", "%20")}'
 
-def is_proxy_blocked(proxy, conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM blocked_proxies WHERE proxy = ?", (proxy,))
-    return cursor.fetchone() is not None
-
-def add_blocked_proxy(proxy, conn):
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR REPLACE INTO blocked_proxies (proxy) VALUES (?)", (proxy,))
-    conn.commit()
-    logger.warning(f"Proxy {proxy} marked as blocked")
-
-def detect_if_blocked(sb):
+def format_proxy(proxy):
+    ip, port, username, password = proxy.split(':')
+    return f"{username}:{password}@{ip}:{port}"
+
+def browser_options(proxy, headless=False):
+    """Keyword arguments for SB(...) with the given ip:port:user:pass proxy."""
+    return dict(uc=True,
+                test=True,
+                locale="en",
+                proxy=format_proxy(proxy),
+                headless=headless,
+                headless1=False,
+                headless2=False,
+                incognito=True,
+                multi_proxy=True,
+                do_not_track=True,
+                ad_block=True,
+                browser='chrome',
+                disable_csp=True,
+                undetectable=True,
+                ad_block_on=True,
+                headed=not headless,
+                )
+
+def detect_if_blocked(sb, snapshot=None):
     try:
-        page_source = sb.get_page_source()
-        soup = BeautifulSoup(page_source, 'html.parser')
-        text = soup.get_text()
-        if "Access Denied" in text or "Sorry, you have been blocked" in text or "This site can't be reached" in text:
+        if snapshot is None:
+            snapshot = parse_pool.pool.capture(sb)
+        if snapshot.kind == BLOCKED:
             logger.warning("Proxy is blocked: Access Denied or Sorry message found.")
             return True
         return False
@@ -148,23 +148,35 @@ def handle_consent_dialog_if_present(sb):
         logger.info("Consent dialog not found.")
         return False
 
-def solve_press_and_hold_captcha_if_present(sb, hold_time=12):
-    """Detect and solve press & hold captcha if present. Uses pyautogui if block page detected."""
+def solve_press_and_hold_captcha_if_present(sb, hold_time=12, snapshot=None):
+    """
+    Detect and solve press & hold captcha if present. The hold is sent to the #px-captcha
+    box through CDP input events, so it works headless; --gui-captcha uses the old
+    pyautogui hold at fixed screen coordinates instead.
+    """
     try:
         # Check for block message in page source
-        page_source = sb.get_page_source()
-        soup = BeautifulSoup(page_source, "html.parser")
-        text = soup.get_text()
-
-        if "Access to this page has been denied" in text:
-            sb.sleep(5)
+        if snapshot is None:
+            snapshot = parse_pool.pool.capture(sb)
+
+        if snapshot.kind == PRESS_HOLD:
+            wait_for_page_state(sb, 'challenge')
+            if not use_gui_captcha:
+                logger.info("Block page detected! Holding the press & hold captcha through CDP.")
+                if captcha_solver.press_and_hold(sb, hold_time):
+                    wait_for_page_state(sb, 'challenge_cleared')
+                    logger.info("Press & Hold captcha solved via CDP input.")
+                    return True
+                logger.warning("No press & hold box found on the page.")
+                return False
+            import pyautogui  # needs a real display
             logger.info("Block page detected! Using pyautogui to solve press & hold captcha.")
             # pyautogui.moveTo(x=661, y=585, duration=0.4) # for windows 11 Safeer PC 
             pyautogui.moveTo(x=662, y=564, duration=0.4) # for windows 10 Umair laptop
             pyautogui.mouseDown()
             time.sleep(hold_time)
             pyautogui.mouseUp()
-            sb.sleep(10)
+            wait_for_page_state(sb, 'challenge_cleared')
             pyautogui.moveTo(x=1150, y=77, duration=0.4)
             logger.info("Press & Hold captcha solved via pyautogui.")
             return True
@@ -172,408 +184,473 @@ def solve_press_and_hold_captcha_if_present(sb, hold_time=12):
         logger.error(f"Error solving press & hold captcha: {e}")
     return False
 
-def solve_click_captcha_if_present(sb):
-    """Detect and solve click captcha if present."""
-    page_source = sb.get_page_source()
-    soup = BeautifulSoup(page_source, "html.parser")
-    text = soup.get_text()
-    if "Just a moment..." in text or "Captcha" in text:
+def solve_click_captcha_if_present(sb, snapshot=None):
+    """
+    Detect and solve click captcha if present: CDP mouse events on the widget, then
+    seleniumbase's uc_gui_click_captcha if no widget was found (or always with --gui-captcha).
+    """
+    if snapshot is None:
+        snapshot = parse_pool.pool.capture(sb)
+    if snapshot.kind == CLICK_CAPTCHA:
         logger.info("Click captcha detected, attempting to solve...")
         try:
-            sb.uc_gui_click_captcha()
-            sb.sleep(10)
+            if use_gui_captcha:
+                sb.uc_gui_click_captcha()
+            elif not captcha_solver.click_challenge(sb):
+                # Turnstile can render the checkbox out of reach of the CDP solver; seleniumbase's
+                # own GUI click still gets it on a headed browser, as main.py does
+                logger.warning("No click challenge widget found on the page, falling back to the GUI click.")
+                sb.uc_gui_click_captcha()
+            wait_for_page_state(sb, 'challenge_cleared')
             logger.info("Click captcha clicked.")
             return True
         except Exception as e:
             logger.error(f"Error clicking click captcha: {e}")
     return False
 
-def handle_captchas(sb):
-    """Detect and solve click or press & hold captchas, as many times as needed."""
+def handle_captchas(sb, snapshot=None, attempt=None, session=None):
+    """
+    Detect and solve click or press & hold captchas, as many times as needed.
+    Returns the snapshot of the current page; it is only re-fetched after a solver ran.
+    Challenges seen are counted in attempt['challenges'] when an attempt dict is given.
+    Solver time goes to the challenge tracker, and a `session` (challenge_state.session_key)
+    is marked clear once a solver got through, or invalidated if it is challenged anyway.
+    """
+    solved_kind = None
     for _ in range(2):  # Sometimes a captcha can reload once - try twice
-        solved = False
-        page_source = sb.get_page_source()
-        soup = BeautifulSoup(page_source, "html.parser")
-        text = soup.get_text()
-        # Try press & hold
-        if "Access to this page has been denied" in text:
-            solved |= solve_press_and_hold_captcha_if_present(sb)
-        if "Just a moment..." in text or "Captcha" in text:
-            solved |= solve_click_captcha_if_present(sb)
+        if snapshot is None:
+            snapshot = parse_pool.pool.capture(sb)
+        if not snapshot.is_challenge:
+            break
+        kind = snapshot.kind
+        if attempt is not None:
+            attempt['challenges'] = attempt.get('challenges', 0) + 1
+        if session is not None:
+            challenge_tracker.invalidate(session, kind)
+        started = time.time()
+        if kind == PRESS_HOLD:
+            solved = solve_press_and_hold_captcha_if_present(sb, snapshot=snapshot)
+        else:
+            solved = solve_click_captcha_if_present(sb, snapshot=snapshot)
+        challenge_tracker.record_solve(kind, time.time() - started, solved)
         if not solved:
             break
-        sb.sleep(2)
-
-def scrape_person_data(sb, name, address, current_proxy, conn):
+        solved_kind = kind
+        # The page changed, the next pass needs a fresh snapshot
+        snapshot = None
+        wait_for_page_state(sb, 'results', timeout=2)
+    if snapshot is None:
+        snapshot = parse_pool.pool.capture(sb)
+    if solved_kind is not None and session is not None and not snapshot.is_challenge:
+        challenge_tracker.mark_cleared(session, clearance_expiry(sb))
+    return snapshot
+
+def scrape_person_data(sb, name, address, current_proxy, conn, attempt=None):
+    """
+    Look one person up in the browser: (data, is_blocked). With an attempt dict, the
+    time spent in each phase is added to attempt['phases'] (see metrics.py).
+    """
     url = address_to_url_conv(name, address)
-    sb.activate_cdp_mode(url)
-    sb.sleep(15)
-    handle_captchas(sb)
-    handle_captchas(sb)
-    handle_captchas(sb)
+    with timed_phase(attempt, PACING):
+        throttle(current_proxy)
+    with timed_phase(attempt, NAVIGATION):
+        open_url(sb, url)
+        wait_for_page_state(sb, 'results')
+    # One snapshot is shared by every check until a solver changes the page
+    session = session_key(sb, current_proxy)
+    with timed_phase(attempt, CAPTCHA):
+        snapshot = handle_captchas(sb, attempt=attempt, session=session)
+        if challenge_tracker.is_clear(session) and not snapshot.is_challenge:
+            # The session holds a valid clearance: further passes would only re-check this page
+            challenge_tracker.record_skip()
+        else:
+            snapshot = handle_captchas(sb, snapshot, attempt, session)
+            snapshot = handle_captchas(sb, snapshot, attempt, session)
     sb.execute_script("window.stop();")
-    handle_consent_dialog_if_present(sb)
+    with timed_phase(attempt, CONSENT):
+        handle_consent_dialog_if_present(sb)
 
-    try:
-        page_source = sb.get_page_source()
-        soup = BeautifulSoup(page_source, 'html.parser')
-        text = soup.get_text()
-        if "Access Denied" in text or "Sorry, you have been blocked" in text or "This site can't be reached" in text:
-            logger.warning(f"Proxy {current_proxy} is blocked")
-            add_blocked_proxy(current_proxy, conn)
-            return None, True
-    except Exception as e:
-        logger.error(f"Error accessing URL: {str(e)}")
-        if "proxy" in str(e).lower() or "connection" in str(e).lower():
-            logger.warning(f"Proxy {current_proxy} appears to be blocked")
+    if snapshot.kind == BLOCKED:
+        logger.warning(f"Proxy {current_proxy} is blocked")
+        if conn is not None:
             add_blocked_proxy(current_proxy, conn)
-            return None, True
+        return None, True
+    if snapshot.is_challenge:
+        # Reading the page now would save a captcha as "no record found"
+        logger.warning(f"{snapshot.kind} challenge still showing for {name}, giving up on this attempt")
+        note_failure(attempt, retry_policy.CHALLENGE_TIMEOUT)
         return None, False
 
-    data = {
-        'TPS Verified Name': '',
-        'TPS Address': '',
-        'Phone 1': '',
-        'Phone 2': '',
-        'Phone 3': '',
-        'Phone 4': '',
-        'Email 1': '',
-        'Email 2': '',
-        'Email 3': '',
-        'Remarks': 'No record found',
-        'Used Proxy': current_proxy
-    }
+    data = empty_record('No record found', current_proxy)
     xpaths = [
         '/html/body/div[3]/div/div[2]/div[3]/div[1]',
         '/html/body/div[3]/div/div[2]/div[1]/div[1]',
     ]
     sb.execute_script("window.stop();")
-    try:
-        for xpath in xpaths:
-            script = f"""
-            var element = document.evaluate("{xpath}", document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-            return element ? element.textContent : null;
-            """
-            try:
-                found_or_not = sb.execute_script(script)
-                if found_or_not is not None:
-                    break
-            except:
-                continue
-        logger.info(found_or_not)
-        if found_or_not.split():
-            number_found = int(found_or_not.split()[0])
-        else:
-            number_found = 0
-        data['Remarks'] = found_or_not
-    except:
+    results_read = time.perf_counter()
+    found_or_not = None
+    for xpath in xpaths:
+        script = f"""
+        var element = document.evaluate("{xpath}", document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return element ? element.textContent : null;
+        """
+        try:
+            found_or_not = sb.execute_script(script)
+            if found_or_not is not None:
+                break
+        except:
+            continue
+    logger.info(found_or_not)
+    number_found = result_count(found_or_not)
+    if attempt is not None:
+        metrics.add_phase(attempt.setdefault('phases', {}), EXTRACTION, time.perf_counter() - results_read)
+    if number_found is None:
+        if snapshot.kind != NOT_FOUND:
+            # No results count on a page that does not say "no records": the layout moved
+            # or the page is half loaded, and saving "not found" would hide a real person
+            logger.warning(f"No results count on the {snapshot.kind} page for {name}")
+            note_failure(attempt, retry_policy.SELECTOR_MISS)
+            return None, False
         not_found = f'Record Not Found against {name}.'
         logger.info(not_found)
         number_found = 0
-        data['Remarks'] = not_found
+        data.remarks = not_found
+    else:
+        data.remarks = found_or_not
+    if number_found == 0:
+        note_not_found(attempt)
 
     if number_found <= 6 and number_found != 0:
         try:
-            handle_consent_dialog_if_present(sb)
+            with timed_phase(attempt, CONSENT):
+                handle_consent_dialog_if_present(sb)
             try:
                 selectors = ['body > div:nth-child(3) > div > div.content-center > div:nth-child(4) > div:nth-child(1) > div.col-md-4.hidden-mobile.text-center.align-self-center > a',
                 'body > div:nth-child(3) > div > div.content-center > div:nth-child(4) > div:nth-child(1) > div.col-md-4.hidden-mobile.text-center.align-self-center > a'
                 ]
+                clicked = False
                 for selector in selectors:
                     sb.execute_script(f"""
                             var btn = document.querySelector('{selector}');
                             if(btn) {{ btn.scrollIntoView({{behavior: 'smooth', block: 'center'}}); }}
                         """)
                     try:
-                        clicked = sb.execute_script(f"document.querySelector('{selector}').click();")
-                        sb.sleep(8)
+                        with timed_phase(attempt, PACING):
+                            throttle(current_proxy)
+                        with timed_phase(attempt, DETAILS_CLICK):
+                            sb.execute_script(f"document.querySelector('{selector}').click();")
+                            clicked = True
+                            wait_for_page_state(sb, 'details')
                         break
                     except:
                         continue
             except Exception as e:
                 logger.error(f"Error clicking link to view data: {str(e)}")
+                note_failure(attempt, retry_policy.SELECTOR_MISS)
                 return None, False
-            handle_captchas(sb)
-            handle_consent_dialog_if_present(sb)
-
-            page_source = sb.get_page_source()
-            soup = BeautifulSoup(page_source, "html.parser")
-            text = soup.get_text()
-            if 'Access to this page has been denied' in text:
-                logger.warning('"Please try again" message encountered, but continuing to process the row.')
-                return None, True
-
-            # Extract data from text using pattern matching
-            data = extract_data_from_text(text, current_proxy)
+            if not clicked:
+                logger.error(f"No View Details button for {name} although {number_found} records were found")
+                note_failure(attempt, retry_policy.SELECTOR_MISS)
+                return None, False
+            with timed_phase(attempt, CAPTCHA):
+                snapshot = handle_captchas(sb, attempt=attempt, session=session)
+            with timed_phase(attempt, CONSENT):
+                if handle_consent_dialog_if_present(sb):
+                    snapshot = parse_pool.pool.capture(sb)
+            with timed_phase(attempt, EXTRACTION):
+                text = snapshot.text
+                if PRESS_HOLD_MARKER in text:
+                    logger.warning('"Please try again" message encountered, but continuing to process the row.')
+                    return None, True
+                if snapshot.is_challenge:
+                    logger.warning(f"{snapshot.kind} challenge still showing on the details page of {name}")
+                    note_failure(attempt, retry_policy.CHALLENGE_TIMEOUT)
+                    return None, False
+
+                # Extract data from text using pattern matching
+                data = extract_data_from_text(text, current_proxy)
             
             logger.info('Record found! Going to next...')
 
         except Exception as e:
             logger.error(f'Error extracting details: {str(e)}')
+            # Saving the results-page record here would turn a found person into a miss
+            note_failure(attempt, retry_policy.classify_exception(e))
+            return None, False
 
     return data, False
 
 def extract_data_from_text(text, current_proxy):
     """Extract person data from scraped text using pattern matching"""
-    data = {
-        'TPS Verified Name': '',
-        'TPS Address': '',
-        'Phone 1': '',
-        'Phone 2': '',
-        'Phone 3': '',
-        'Phone 4': '',
-        'Email 1': '',
-        'Email 2': '',
-        'Email 3': '',
-        'Remarks': 'Record found',
-        'Used Proxy': current_proxy
-    }
-    
-    try:
-        # Extract Name (everything before first comma)
-        name_match = re.search(r'^([^,]+),', text.strip())
-        if name_match:
-            tps_verified_name = name_match.group(1).strip()
-            logger.info(f'Truepeoplesearch name = {tps_verified_name}')
-            data['TPS Verified Name'] = tps_verified_name
-        else:
-            logger.warning("Could not find TPS Verified Name")
-
-        # Extract Current Address
-        current_address_pattern = r'Current Address.*?This is the most recently reported address.*?\n\n([^\n]+)'
-        address_match = re.search(current_address_pattern, text, re.DOTALL)
-        if address_match:
-            tps_address = address_match.group(1).strip()
-            # Clean up the address by removing extra info
-            tps_address = re.sub(r'\$.*', '', tps_address).strip()
-            logger.info(f'Truepeoplesearch address = {tps_address}')
-            data['TPS Address'] = tps_address
-        else:
-            logger.warning("Could not find TPS Address")
-
-        # Extract Phone Numbers (only wireless)
-        # Revised section pattern to robustly capture the content block
-        phone_section_pattern = r'(Phone Numbers[\s\S]*?Includes the current and past phone numbers[\s\S]*?)([\s\S]*?)(?=\s*Email Addresses|\s*Background Report|$)'
-        phone_section_match = re.search(phone_section_pattern, text, re.DOTALL)
-        
-        if phone_section_match:
-            # Group 2 captures the content block after the introductory text
-            phone_section_content = phone_section_match.group(2) 
-            
-            # Find all phone entries with "Wireless" designation within the extracted section content
-            phone_pattern = r'\((\d{3})\) (\d{3})-(\d{4}) - Wireless'
-            phone_matches = re.findall(phone_pattern, phone_section_content)
-            
-            phone_keys = ['Phone 1', 'Phone 2', 'Phone 3', 'Phone 4']
-            for i, phone_match in enumerate(phone_matches[:4]):  # Only first 4 phones
-                if i < len(phone_keys):
-                    # Reconstruct the phone number in the desired format
-                    phone_number = f"({phone_match[0]}) {phone_match[1]}-{phone_match[2]}"
-                    logger.info(f'{phone_keys[i]} = {phone_number}')
-                    data[phone_keys[i]] = phone_number
-        else:
-            logger.warning("Could not find Phone Numbers section or its content.")
-
-        # Extract Email Addresses
-        # Revised section pattern to robustly capture the content block
-        email_section_pattern = r'(Email Addresses[\s\S]*?Includes all known email addresses[\s\S]*?)([\s\S]*?)(?=\s*Current Address Property Details|$)'
-        email_section_match = re.search(email_section_pattern, text, re.DOTALL)
-        
-        if email_section_match:
-            # Group 2 captures the content block after the introductory text
-            email_section_content = email_section_match.group(2)
-            
-            # Find all email addresses within the extracted section content
-            email_pattern = r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-            email_matches = re.findall(email_pattern, email_section_content)
-            
-            email_keys = ['Email 1', 'Email 2', 'Email 3']
-            for i, email in enumerate(email_matches[:3]):  # Only first 3 emails
-                if i < len(email_keys):
-                    logger.info(f'{email_keys[i]} = {email}')
-                    data[email_keys[i]] = email
-        else:
-            logger.warning("Could not find Email Addresses section or its content.")
-
-    except Exception as e:
-        logger.error(f'Error in extract_data_from_text: {str(e)}')
-    
-    return data
-
-def shift_data_left(data):
-    phones = [data[f'Phone {i}'] for i in range(1, 5)]
-    non_empty_phones = [p for p in phones if p]
-    shifted_phones = non_empty_phones + [''] * (4 - len(non_empty_phones))
-    emails = [data[f'Email {i}'] for i in range(1, 4)]
-    non_empty_emails = [e for e in emails if e]
-    shifted_emails = non_empty_emails + [''] * (3 - len(non_empty_emails))
-    for i in range(1, 5):
-        data[f'Phone {i}'] = shifted_phones[i-1] if i-1 < len(shifted_phones) else ''
-    for i in range(1, 4):
-        data[f'Email {i}'] = shifted_emails[i-1] if i-1 < len(shifted_emails) else ''
-    return data
-
-def save_to_database(conn, row_id, data):
-    data = shift_data_left(data)
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO scraped_data 
-    (input_row_id, tps_verified_name, tps_address, phone1, phone2, phone3, phone4, email1, email2, email3, remarks, used_proxy)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        row_id,
-        data['TPS Verified Name'],
-        data['TPS Address'],
-        data['Phone 1'],
-        data['Phone 2'],
-        data['Phone 3'],
-        data['Phone 4'],
-        data['Email 1'],
-        data['Email 2'],
-        data['Email 3'],
-        data['Remarks'],
-        data['Used Proxy']
-    ))
-    conn.commit()
-
-def export_to_csv(conn, input_data):
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT * FROM scraped_data ORDER BY input_row_id
-    ''')
-    scraped_data = cursor.fetchall()
-    columns = ['id', 'input_row_id', 'TPS Verified Name', 'TPS Address', 'Phone 1', 'Phone 2', 
-               'Phone 3', 'Phone 4', 'Email 1', 'Email 2', 'Email 3', 'Remarks', 'Used Proxy']
-    df_scraped = pd.DataFrame(scraped_data, columns=columns)
-    df_scraped = df_scraped.drop(['id'], axis=1)
-    df_scraped = df_scraped.rename(columns={'input_row_id': 'original_index'})
-    input_data['original_index'] = input_data.index
-    combined_data = pd.merge(input_data, df_scraped, on='original_index', how='left')
-    combined_data = combined_data.drop(['original_index'], axis=1)
-    output_file = "TPS_output_data_ready_for_call_tools.csv"
-    combined_data.to_csv(output_file, index=False)
-    logger.info(f"Data exported to {output_file}")
+    return parse_pool.pool.extract(text, current_proxy)
+
+def fill_from_cache(groups, conn, ttl_hours, negative_ttl_hours, writer, input_file_name, cache_stats):
+    """Save cached results for the groups that have one and return the rest, still to be looked up."""
+    pending = []
+    for row_ids, name, address in groups:
+        cached = get_cached_result(conn, normalize_lookup_key(name, address), ttl_hours, negative_ttl_hours)
+        if cached is None:
+            cache_stats.misses += 1
+            pending.append((row_ids, name, address))
+            continue
+        cache_stats.record_hit(cached)
+        for row_id in row_ids:
+            writer.save(row_id, cached)
+            writer.progress(row_id, input_file_name, DONE)
+        metrics.recorder.finish(metrics.recorder.row(row_ids), 'cached', None)
+    return pending
+
+def run_coordinator(queue, input_file_name, rows, resume, writer, range_size, progress_callback=None):
+    """
+    --coordinator: queue the input's rows in ranges of range_size, then save the results
+    workers report until every range is done. A resumed run keeps the ranges still queued,
+    and the results not yet imported when the last run stopped.
+    """
+    if not resume or (queue.is_finished(input_file_name) and not queue.has_pending_results(input_file_name)):
+        queue.reset(input_file_name)
+        queue.enqueue(input_file_name, rows, range_size)
+    else:
+        logger.info(f"Resuming the ranges already queued for {input_file_name}: {queue.counts(input_file_name)}")
+    saved = 0
+    while True:
+        # Checked before taking results so the last ranges' results are still saved
+        finished = queue.is_finished(input_file_name)
+        results = queue.pending_results(input_file_name)
+        for row_id, record, success in results:
+            writer.save(row_id, record)
+            writer.progress(row_id, input_file_name, DONE if success else FAILED)
+        # Only results committed to the results database are marked imported: a crash before
+        # that leaves them pending in the queue for the resumed run
+        if results and writer.flush():
+            queue.mark_imported(input_file_name, [row_id for row_id, _, _ in results])
+            saved += len(results)
+        elif results:
+            logger.error(f"Database writer did not commit {len(results)} results; they stay queued")
+        if finished:
+            break
+        if progress_callback is not None:
+            progress_callback()
+        logger.info(f"Queue ranges: {queue.counts(input_file_name)}, {saved} rows saved")
+        time.sleep(QUEUE_POLL_SECONDS)
+    given_up = queue.given_up_rows(input_file_name)
+    for row_id in given_up:
+        writer.save(row_id, empty_record(f'Lease given up after {queue.max_attempts} attempts', None))
+        writer.progress(row_id, input_file_name, FAILED)
+    logger.info(f"All ranges of {input_file_name} finished: {saved} rows saved, {len(given_up)} given up")
+    return saved
+
+def run_queue_worker(queue, worker_id, proxy_scheduler, workers, session_options, writer, conn, cache_ttl_hours,
+                     negative_ttl_hours, cache_stats, max_proxy_uses=15, http_pool=None):
+    """
+    --worker: claim ranges from the coordinator's queue and scrape each with a worker
+    pool on this host's proxies, until every range is done. The lease is renewed while
+    the pool runs; results go back to the queue, cache entries to this host's database.
+    """
+    ranges = 0
+    while True:
+        lease = queue.claim(worker_id)
+        if lease is None:
+            if queue.is_finished():
+                break
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+        logger.info(f"[{worker_id}] Leased range {lease.range_id}: {len(lease.rows)} rows of {lease.input_file}")
+        collector = LeaseCollector(writer)
+        try:
+            pending = fill_from_cache(group_duplicate_rows(lease.rows), conn, cache_ttl_hours, negative_ttl_hours,
+                                      collector, lease.input_file, cache_stats)
+            run_worker_pool(pending, lease.input_file, proxy_scheduler, workers, scrape_person_data,
+                            session_options, collector, max_proxy_uses=max_proxy_uses, http_pool=http_pool,
+                            progress_callback=lambda: queue.renew(lease),
+                            progress_interval=queue.lease_seconds / 3, max_cooldown_wait=MAX_COOLDOWN_WAIT)
+        except BaseException:
+            queue.release(lease)
+            raise
+        if len(collector.records) < len(lease.rows):
+            # The pool stopped early, most likely out of proxies: let another host take the range
+            logger.error(f"[{worker_id}] Only {len(collector.records)} of {len(lease.rows)} rows done, "
+                         f"handing range {lease.range_id} back")
+            queue.release(lease)
+            break
+        queue.complete(lease, collector.results(), worker_id)
+        ranges += 1
+    logger.info(f"[{worker_id}] Queue worker finished after {ranges} ranges")
+    return ranges
+
+def log_run_summary(cache_stats, proxy_scheduler):
+    """Log the end-of-run figures of every stage, then stop the metrics recorder and the parse pool."""
+    logger.info(f"Run summary: {cache_stats.summary()}")
+    logger.info(f"Proxies: {proxy_scheduler.summary()}, {rate_limiter.limiter.summary()}")
+    logger.info(f"Captchas: {challenge_tracker.summary()}")
+    logger.info(f"Retries: {retry_policy.policy.summary()}")
+    logger.info(f"Timing: {metrics.recorder.summary()}")
+    metrics.recorder.close()
+    logger.info(f"Parsing: {parse_pool.pool.summary()}")
+    parse_pool.pool.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='TruePeopleSearch scraper')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of browsers to run at once, each pinned to its own proxy (default: 1)')
+    parser.add_argument('--http-first', action='store_true',
+                        help='Try each lookup over plain HTTP first and only open the browser on a challenge')
+    parser.add_argument('--cache-ttl-hours', type=float, default=DEFAULT_TTL_HOURS,
+                        help=f'Reuse cached lookups younger than this; 0 disables the cache (default: {DEFAULT_TTL_HOURS})')
+    parser.add_argument('--negative-cache-ttl-hours', type=float, default=DEFAULT_NEGATIVE_TTL_HOURS,
+                        help=f'Reuse cached "no record found" searches younger than this; 0 looks them up again '
+                             f'(default: {DEFAULT_NEGATIVE_TTL_HOURS})')
+    parser.add_argument('--refresh-negative', action='store_true',
+                        help='Look up again every search cached as not found, replacing the cached result')
+    parser.add_argument('--rate', type=float, default=rate_limiter.DEFAULT_GLOBAL_RATE,
+                        help=f'Page loads per second across all sessions; 0 means unlimited (default: {rate_limiter.DEFAULT_GLOBAL_RATE})')
+    parser.add_argument('--burst', type=int, default=rate_limiter.DEFAULT_GLOBAL_BURST,
+                        help=f'Page loads allowed at once before --rate applies (default: {rate_limiter.DEFAULT_GLOBAL_BURST})')
+    parser.add_argument('--proxy-rate', type=float, default=rate_limiter.DEFAULT_PROXY_RATE,
+                        help=f'Page loads per second through any one proxy; 0 means unlimited (default: {rate_limiter.DEFAULT_PROXY_RATE})')
+    parser.add_argument('--proxy-burst', type=int, default=rate_limiter.DEFAULT_PROXY_BURST,
+                        help=f'Page loads allowed at once through one proxy (default: {rate_limiter.DEFAULT_PROXY_BURST})')
+    parser.add_argument('--async-tabs', type=int, default=0,
+                        help='Run lookups as async tabs, this many at once, sharing one browser per proxy (default: off)')
+    parser.add_argument('--headless', action='store_true',
+                        help='Run browsers headless; captchas are solved through CDP input events, no display needed')
+    parser.add_argument('--gui-captcha', action='store_true',
+                        help='Solve captchas with pyautogui on the real screen (needs a headed browser and a display)')
+    parser.add_argument('--metrics-file', default=metrics.METRICS_FILE,
+                        help=f'Append one JSON line of phase timings per row here; empty to disable (default: {metrics.METRICS_FILE})')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help='Serve rolling p50/p95 per phase, rows/hour and block rates as JSON on this local port (default: off)')
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help='Parse and classify pages and extract details in this many worker processes '
+                             'instead of on the threads driving the browsers (default: 0, inline)')
+    parser.add_argument('--proxies', default='proxies.txt',
+                        help='File with one ip:port:username:password proxy per line (default: proxies.txt)')
+    parser.add_argument('--db', default=DB_PATH,
+                        help=f'SQLite database for results, cache and proxy health (default: {DB_PATH})')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--coordinator', nargs='?', const=QUEUE_PATH, metavar='QUEUE_DB',
+                      help=f'Split the input into leased row ranges in QUEUE_DB (default: {QUEUE_PATH}) for '
+                           f'--worker processes, then save and export their results')
+    mode.add_argument('--worker', nargs='?', const=QUEUE_PATH, metavar='QUEUE_DB',
+                      help='Scrape row ranges leased from a coordinator\'s QUEUE_DB with this host\'s --proxies '
+                           'and --workers browsers, until the queue is done')
+    parser.add_argument('--lease-rows', type=int, default=DEFAULT_RANGE_SIZE,
+                        help=f'Rows per leased range (coordinator, default: {DEFAULT_RANGE_SIZE})')
+    parser.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS,
+                        help=f'A range not renewed for this long is handed to another worker (default: {DEFAULT_LEASE_SECONDS})')
+    parser.add_argument('--worker-id', default=None,
+                        help='Name this worker reports to the queue (default: hostname:pid)')
+    return parser.parse_args()
 
 def main():
-    conn = setup_database()
-    with open('proxies.txt', 'r') as file:
-        all_proxies = [line.strip() for line in file if line.strip()]
-    cursor = conn.cursor()
-    cursor.execute("SELECT proxy FROM blocked_proxies")
-    blocked = [row[0] for row in cursor.fetchall()]
-    proxies = [p for p in all_proxies if p not in blocked]
-    if not proxies:
-        logger.error("All proxies are blocked. Please add new proxies.")
+    global use_gui_captcha
+    args = parse_args()
+    if args.headless and args.gui_captcha:
+        logger.error("--gui-captcha needs a visible browser, it can't be combined with --headless")
+        return
+    use_gui_captcha = args.gui_captcha
+    session_options = functools.partial(browser_options, headless=args.headless)
+    rate_limiter.configure(args.rate, args.burst, args.proxy_rate, args.proxy_burst)
+    metrics.configure(args.metrics_file or None)
+    if args.metrics_port:
+        metrics.recorder.serve(args.metrics_port)
+    parse_pool.configure(args.parse_processes)
+    conn = setup_database(args.db)
+    # All writes go through one batched writer; `conn` is only used for reads from here on
+    writer = DatabaseWriter(args.db)
+    writer.start()
+    cache_stats = CacheStats()
+    negative_ttl_hours = 0 if args.refresh_negative else args.negative_cache_ttl_hours
+    max_proxy_uses = 15
+    http_pool = HttpFetcherPool() if args.http_first else None
+    if not args.coordinator:
+        with open(args.proxies, 'r') as file:
+            all_proxies = [line.strip() for line in file if line.strip()]
+        proxy_scheduler = ProxyScheduler(all_proxies, conn, writer)
+        if not proxy_scheduler.available_count():
+            wait = proxy_scheduler.next_ready_in()
+            if wait is None or wait > MAX_COOLDOWN_WAIT:
+                logger.error("All proxies are blocked or cooling down. Please add new proxies or try again later.")
+                writer.close()
+                conn.close()
+                return
+    if args.worker:
+        queue = JobQueue(args.worker, args.lease_seconds)
+        try:
+            run_queue_worker(queue, args.worker_id or default_worker_id(), proxy_scheduler, args.workers,
+                             session_options, writer, conn, args.cache_ttl_hours, negative_ttl_hours, cache_stats,
+                             max_proxy_uses, http_pool)
+        finally:
+            writer.close()
+            queue.close()
+        log_run_summary(cache_stats, proxy_scheduler)
+        conn.close()
         return
     input_file_name = input('What is input file name?? should be csv file format.\n: ')
-    input_data = pd.read_csv(input_file_name)
-    last_processed_row = get_last_processed_row(conn, input_file_name)
-    start_row = 0
-    if last_processed_row >= 0:
-        resume = input(f"Previous session stopped at row {last_processed_row + 1}. Resume from there? (y/n): ").lower()
+    total_rows = count_input_rows(input_file_name)
+    checkpoint = Checkpoint.load(conn, input_file_name)
+    finished = checkpoint.counts()
+    resume_from = None
+    if finished['done'] or finished['failed']:
+        resume = input(f"Previous session finished {finished['done']} rows ({finished['failed']} failed). "
+                       f"Resume with the remaining and failed rows? (y/n): ").lower()
         if resume == 'y':
-            start_row = last_processed_row + 1
-            logger.info(f"Resuming from row {start_row + 1}")
+            resume_from = checkpoint
+            logger.info(f"Resuming with {total_rows - finished['done']} of {total_rows} rows")
         else:
+            checkpoint.reset()
+            checkpoint.save(conn)
             logger.info("Starting from the beginning")
-    current_proxy = None
-    proxy_use_count = 0
-    max_proxy_uses = 15
-    total_rows = len(input_data)
-    for index, row in input_data.iloc[start_row:].iterrows():
-        name = row['Name (Formatted)']
-        address = row['Contact Address (City, State)']
-        logger.info(f"\nProcessing row {index + 1} of {total_rows}")
-        logger.info(f"Name: {name}, Address: {address}")
-        if current_proxy is None or proxy_use_count >= max_proxy_uses:
-            if proxies:
-                current_proxy = random.choice(proxies)
-                proxy_use_count = 0
-            else:
-                print("No more proxies available. Exiting.")
-                break
-        ip, port, username, password = current_proxy.split(':')
-        formatted_proxy = f"{username}:{password}@{ip}:{port}"
-        success = False
-        retries = 0
-        while not success and retries < 5:
-            try:
-                logger.info(f"Processing row {index + 1}: {name} at {address} with proxy {formatted_proxy}")
-                with SB(uc=True, 
-                        test=True, 
-                        locale="en", 
-                        proxy=formatted_proxy, 
-                        headless=False, 
-                        headless1=False, 
-                        headless2=False, 
-                        incognito=True, 
-                        multi_proxy=True, 
-                        do_not_track=True, 
-                        ad_block=True, 
-                        browser='chrome', 
-                        disable_csp=True,
-                        undetectable=True,
-                        ad_block_on=True,
-                        headed=True, 
-                    ) as sb:
-                    data, is_blocked = scrape_person_data(sb, name, address, current_proxy, conn)
-                    if is_blocked:
-                        proxies.remove(current_proxy)
-                        if proxies:
-                            current_proxy = random.choice(proxies)
-                            ip, port, username, password = current_proxy.split(':')
-                            formatted_proxy = f"{username}:{password}@{ip}:{port}"
-                            proxy_use_count = 0
-                            retries += 1
-                            continue
-                        else:
-                            logger.error("No more proxies available. Exiting.")
-                            break
-                    if data is not None:
-                        logger.info(f"Data saved for row {index + 1}")
-                        save_to_database(conn, index, data)
-                        success = True
-                        proxy_use_count += 1
-                        update_progress(conn, index, input_file_name)
-                    else:
-                        retries += 1
-            except Exception as e:
-                logger.error(f"Error: {str(e)}")
-                retries += 1
-                if "proxy" in str(e).lower() or "connection" in str(e).lower():
-                    logger.warning(f"Proxy {current_proxy} might be blocked")
-                    add_blocked_proxy(current_proxy, conn)
-                    if current_proxy in proxies:
-                        proxies.remove(current_proxy)
-                    if proxies:
-                        current_proxy = random.choice(proxies)
-                        ip, port, username, password = current_proxy.split(':')
-                        formatted_proxy = f"{username}:{password}@{ip}:{port}"
-                        proxy_use_count = 0
-                    else:
-                        print("No more proxies available. Exiting.")
-                        break
-                time.sleep(2)
-            update_progress(conn, index, input_file_name)
-        if not success:
-            logger.error(f"Failed to process row {index + 1}: {name} after {retries} retries")
-            empty_data = {
-                'TPS Verified Name': '',
-                'TPS Address': '',
-                'Phone 1': '',
-                'Phone 2': '',
-                'Phone 3': '',
-                'Phone 4': '',
-                'Email 1': '',
-                'Email 2': '',
-                'Email 3': '',
-                'Remarks': f'Failed after {retries} retries',
-                'Used Proxy': current_proxy
-            }
-            save_to_database(conn, index, empty_data)
+    exporter = CsvExporter(input_file_name)
+
+    def fail_missing_row(row_id, remarks):
+        writer.save(row_id, empty_record(remarks, None))
+        writer.progress(row_id, input_file_name, FAILED)
+
+    def export_finished_rows():
+        # Append the finished prefix of the input so a crash keeps what was exported so far
+        try:
+            writer.flush()
+            exporter.export_ready(conn, Checkpoint.load(conn, input_file_name))
+        except Exception as e:
+            logger.error(f"Incremental export failed, the final export will retry: {str(e)}")
+    if args.coordinator:
+        queue = JobQueue(args.coordinator, args.lease_seconds)
+        try:
+            rows = iter_pending_rows(input_file_name, resume_from, on_missing=fail_missing_row)
+            run_coordinator(queue, input_file_name, rows, resume_from is not None, writer, args.lease_rows,
+                            export_finished_rows)
+        finally:
+            writer.close()
+            queue.close()
+        logger.info("\nAll ranges processed. Exporting results to CSV...")
+        exporter.finish(conn)
+        conn.close()
+        return
+    # The input is streamed with only the two columns we search on. Rows searching for
+    # the same person are looked up once and the result fanned out.
+    groups = group_duplicate_rows(iter_pending_rows(input_file_name, resume_from, on_missing=fail_missing_row))
+    row_count = sum(len(row_ids) for row_ids, _, _ in groups)
+    cache_stats.duplicate_rows = row_count - len(groups)
+    pending = fill_from_cache(groups, conn, args.cache_ttl_hours, negative_ttl_hours, writer, input_file_name,
+                              cache_stats)
+    try:
+        if args.async_tabs:
+            logger.info(f"Starting {args.async_tabs} async tabs for {len(pending)} lookups covering {row_count} of {total_rows} rows")
+            run_async_pool(pending, input_file_name, proxy_scheduler, args.async_tabs, writer,
+                           headless=args.headless)
+        else:
+            # One worker is the sequential run: the same loop, exporting every EXPORT_EVERY rows
+            logger.info(f"Starting {args.workers} workers for {len(pending)} lookups covering {row_count} of {total_rows} rows")
+            run_worker_pool(pending, input_file_name, proxy_scheduler, args.workers, scrape_person_data,
+                            session_options, writer, max_proxy_uses=max_proxy_uses, http_pool=http_pool,
+                            progress_callback=export_finished_rows, progress_rows=EXPORT_EVERY,
+                            max_cooldown_wait=MAX_COOLDOWN_WAIT)
+    finally:
+        writer.close()
+    log_run_summary(cache_stats, proxy_scheduler)
     logger.info("\nAll rows processed. Exporting results to CSV...")
-    export_to_csv(conn, input_data)
+    exporter.finish(conn)
     conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+PRESS_HOLD_SELECTORS = ('#px-captcha',)
+CLICK_CAPTCHA_SELECTORS = (
+    'iframe[src*="challenges.cloudflare.com"]',
+    '.cf-turnstile',
+    '#cf-turnstile',
+)
+# The Turnstile checkbox sits at the left edge of its iframe
+TURNSTILE_CHECKBOX_OFFSET_X = 30
+
+# Viewport bounding box of the first visible match, in the CSS pixels Input.dispatchMouseEvent takes.
+# In CDP mode execute_script runs the text as a top-level script and only strips a `return`
+# on its last line, so the early return lives in a function called from that line.
+ELEMENT_BOX_SCRIPT = """
+var tpsElementBox = function (selectors) {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = document.querySelector(selectors[i]);
+        if (!el) { continue; }
+        el.scrollIntoView({block: 'center'});
+        var r = el.getBoundingClientRect();
+        if (r.width > 0 && r.height > 0) { return [r.left, r.top, r.width, r.height]; }
+    }
+    return null;
+};
+return tpsElementBox(%s);
+"""
+
+def element_box(sb, selectors):
+    script = ELEMENT_BOX_SCRIPT % ('[' + ', '.join(repr(s) for s in selectors) + ']')
+    try:
+        return sb.execute_script(script)
+    except Exception as e:
+        logger.debug(f"Could not measure {selectors}: {e}")
+        return None
+
+def dispatch_mouse(sb, event_type, x, y, pressed=False):
+    """
+    Send one Input.dispatchMouseEvent to the page: through the CDP connection in CDP
+    mode, through chromedriver's execute_cdp_cmd otherwise. Needs no display.
+    """
+    moving = event_type == 'mouseMoved'
+    buttons = 1 if pressed or event_type == 'mousePressed' else 0
+    button = 'left' if buttons or not moving else 'none'
+    click_count = 0 if moving else 1
+    if getattr(sb.driver, '_is_using_cdp', False):
+        import mycdp  # ships with seleniumbase
+        event = mycdp.input_.dispatch_mouse_event(event_type, x=x, y=y, button=mycdp.input_.MouseButton(button),
+                                                  buttons=buttons, click_count=click_count)
+        sb.cdp.loop.run_until_complete(sb.cdp.page.send(event))
+    else:
+        sb.driver.execute_cdp_cmd('Input.dispatchMouseEvent', {
+            'type': event_type, 'x': x, 'y': y, 'button': button,
+            'buttons': buttons, 'clickCount': click_count,
+        })
+
+def _move_to(sb, x, y, steps=6):
+    # Approach from a little way off instead of teleporting onto the element
+    start_x, start_y = x - random.uniform(80, 160), y + random.uniform(40, 90)
+    for i in range(1, steps + 1):
+        dispatch_mouse(sb, 'mouseMoved', start_x + (x - start_x) * i / steps, start_y + (y - start_y) * i / steps)
+        time.sleep(random.uniform(0.03, 0.08))
+
+def press_and_hold(sb, hold_time=12, selectors=PRESS_HOLD_SELECTORS):
+    """Hold the mouse down on the middle of the press & hold box. False if there is no box."""
+    box = element_box(sb, selectors)
+    if not box:
+        return False
+    left, top, width, height = box
+    x = left + width / 2 + random.uniform(-width / 10, width / 10)
+    y = top + height / 2 + random.uniform(-height / 10, height / 10)
+    _move_to(sb, x, y)
+    dispatch_mouse(sb, 'mousePressed', x, y)
+    released_at = time.time() + hold_time
+    while time.time() < released_at:
+        # A perfectly still pointer for 10+ seconds looks scripted
+        time.sleep(min(0.5, max(0.0, released_at - time.time())))
+        dispatch_mouse(sb, 'mouseMoved', x + random.uniform(-1, 1), y + random.uniform(-1, 1), pressed=True)
+    dispatch_mouse(sb, 'mouseReleased', x, y)
+    return True
+
+def click_challenge(sb, selectors=CLICK_CAPTCHA_SELECTORS):
+    """Click the Turnstile checkbox. False if there is no challenge widget."""
+    box = element_box(sb, selectors)
+    if not box:
+        return False
+    left, top, width, height = box
+    x = left + min(TURNSTILE_CHECKBOX_OFFSET_X, width / 2) + random.uniform(-3, 3)
+    y = top + height / 2 + random.uniform(-3, 3)
+    _move_to(sb, x, y)
+    dispatch_mouse(sb, 'mousePressed', x, y)
+    time.sleep(random.uniform(0.05, 0.15))
+    dispatch_mouse(sb, 'mouseReleased', x, y)
+    return True
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cookies the press & hold (PerimeterX) and click (Cloudflare) challenges set once passed
+CLEARANCE_COOKIES = ('_px3', '_pxhd', 'cf_clearance')
+DEFAULT_CLEARANCE_TTL = 30 * 60
+
+def session_key(sb, proxy):
+    """Challenge state belongs to one browser session on one proxy."""
+    return (id(sb), proxy)
+
+def clearance_expiry(sb):
+    """Earliest expiry of the clearance cookies the browser holds, or None if it has none."""
+    try:
+        cookies = sb.get_cookies()
+    except Exception as e:
+        logger.debug(f"Could not read clearance cookies: {e}")
+        return None
+    expiries = [c['expiry'] for c in cookies if c.get('name') in CLEARANCE_COOKIES and c.get('expiry')]
+    return min(expiries) if expiries else None
+
+class ChallengeTracker:
+    """
+    Remembers which sessions have passed a challenge and until when their clearance
+    holds: the clearance cookie's expiry when the browser has one, else clearance_ttl,
+    which is shortened to the observed lifetime whenever a cleared session gets
+    challenged again early. Also keeps solver time and outcomes per challenge type.
+    """
+
+    def __init__(self, clearance_ttl=DEFAULT_CLEARANCE_TTL):
+        self.clearance_ttl = clearance_ttl
+        self._clear_until = {}
+        self._cleared_at = {}
+        self._solver = {}
+        self.skipped_passes = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def is_clear(self, key):
+        with self._lock:
+            return time.time() < self._clear_until.get(key, 0)
+
+    def mark_cleared(self, key, expires_at=None):
+        now = time.time()
+        with self._lock:
+            self._cleared_at[key] = now
+            self._clear_until[key] = expires_at if expires_at and expires_at > now else now + self.clearance_ttl
+
+    def invalidate(self, key, kind):
+        """A challenge was served although the session was believed clear."""
+        now = time.time()
+        with self._lock:
+            if now >= self._clear_until.pop(key, 0):
+                return
+            self.invalidations += 1
+            cleared_at = self._cleared_at.pop(key, None)
+            if cleared_at is not None:
+                lifetime = now - cleared_at
+                self.clearance_ttl = min(self.clearance_ttl, max(lifetime, 60))
+        logger.info(f"'{kind}' challenge served to a cleared session, clearance TTL now {self.clearance_ttl:.0f}s")
+
+    def forget(self, key):
+        with self._lock:
+            self._clear_until.pop(key, None)
+            self._cleared_at.pop(key, None)
+
+    def record_skip(self):
+        with self._lock:
+            self.skipped_passes += 1
+
+    def record_solve(self, kind, seconds, solved):
+        with self._lock:
+            stats = self._solver.setdefault(kind, {'attempts': 0, 'solved': 0, 'seconds': 0.0})
+            stats['attempts'] += 1
+            stats['solved'] += bool(solved)
+            stats['seconds'] += seconds
+
+    def summary(self):
+        with self._lock:
+            parts = [f"{kind}: {s['solved']}/{s['attempts']} solved, {s['seconds'] / s['attempts']:.1f}s avg"
+                     for kind, s in self._solver.items()]
+            return (f"challenges {'; '.join(parts) or 'none'}; {self.skipped_passes} solver passes skipped, "
+                    f"{self.invalidations} clearances lost early")
+
+# Shared by every session in the process, like rate_limiter.limiter
+tracker = ChallengeTracker()
@@ -0,0 +1,61 @@
+import logging
+import time
+import zlib
+
+from database import get_processed_rows
+
+logger = logging.getLogger(__name__)
+
+PENDING = 0
+DONE = 1
+FAILED = 2
+
+class Checkpoint:
+    """
+    Per-input-file row status kept as one status byte per row and stored zlib-compressed
+    in a single row_checkpoints row, which is upserted instead of appended to.
+    """
+
+    def __init__(self, input_file, status=None):
+        self.input_file = input_file
+        self.status = status if status is not None else bytearray()
+
+    @classmethod
+    def load(cls, conn, input_file):
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM row_checkpoints WHERE input_file = ?", (input_file,))
+        row = cursor.fetchone()
+        if row is not None:
+            return cls(input_file, bytearray(zlib.decompress(row[0])))
+        checkpoint = cls(input_file)
+        # One-off migration from the old append-only scraping_progress table
+        legacy_rows = get_processed_rows(conn, input_file)
+        if legacy_rows:
+            logger.info(f"Migrating {len(legacy_rows)} rows of scraping_progress into the checkpoint for {input_file}")
+            for row_index in legacy_rows:
+                checkpoint.mark(row_index, DONE)
+        return checkpoint
+
+    def save(self, conn, commit=True):
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO row_checkpoints (input_file, status, updated_at) VALUES (?, ?, ?)",
+                       (self.input_file, zlib.compress(bytes(self.status)), time.time()))
+        if commit:
+            conn.commit()
+
+    def mark(self, row_index, status=DONE):
+        if row_index >= len(self.status):
+            self.status.extend(b'\x00' * (row_index + 1 - len(self.status)))
+        self.status[row_index] = status
+
+    def get(self, row_index):
+        return self.status[row_index] if row_index < len(self.status) else PENDING
+
+    def reset(self):
+        self.status = bytearray()
+
+    def counts(self):
+        return {
+            'done': self.status.count(DONE),
+            'failed': self.status.count(FAILED),
+        }
@@ -0,0 +1,143 @@
+import sqlite3
+import logging
+
+from person_record import PersonRecord
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'tps_data.db'
+
+def setup_database(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # WAL lets the writer thread commit while other connections read, and NORMAL sync
+    # only fsyncs at checkpoints instead of on every commit
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scraped_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        input_row_id INTEGER,
+        tps_verified_name TEXT,
+        tps_address TEXT,
+        remarks TEXT,
+        used_proxy TEXT
+    )
+    ''')
+    # The export walks results in row order and keeps the newest one per row
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraped_data_row ON scraped_data (input_row_id, id)")
+    # Every phone and email of a result, in page order; kind is 'phone' or 'email'
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scraped_contacts (
+        result_id INTEGER NOT NULL REFERENCES scraped_data (id),
+        kind TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (result_id, kind, position)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraped_contacts_value ON scraped_contacts (kind, value)")
+    migrate_legacy_contacts(conn)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blocked_proxies (
+        proxy TEXT PRIMARY KEY,
+        blocked_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scraping_progress (
+        id INTEGER PRIMARY KEY,
+        last_processed_row INTEGER,
+        input_file TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS row_checkpoints (
+        input_file TEXT PRIMARY KEY,
+        status BLOB,
+        updated_at REAL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS lookup_cache (
+        cache_key TEXT PRIMARY KEY,
+        result TEXT,
+        cached_at REAL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS proxy_health (
+        proxy TEXT PRIMARY KEY,
+        attempts INTEGER,
+        successes INTEGER,
+        captchas INTEGER,
+        total_latency REAL,
+        blocks INTEGER,
+        strikes INTEGER,
+        last_block REAL,
+        cooldown_until REAL
+    )
+    ''')
+    conn.commit()
+    return conn
+
+def get_processed_rows(conn, input_file):
+    """Return every row index that has a progress entry, for out-of-order (parallel) resumes."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT last_processed_row FROM scraping_progress WHERE input_file = ?", (input_file,))
+    return {row[0] for row in cursor.fetchall()}
+
+def add_blocked_proxy(proxy, conn, commit=True):
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR REPLACE INTO blocked_proxies (proxy) VALUES (?)", (proxy,))
+    if commit:
+        conn.commit()
+    logger.warning(f"Proxy {proxy} marked as blocked")
+
+def migrate_legacy_contacts(conn):
+    """
+    Databases from before scraped_contacts keep phones and emails in scraped_data's
+    phone1-phone4 and email1-email3 columns. Copy them into scraped_contacts and clear
+    the columns, so the copy happens once and the export only reads the child table.
+    """
+    cursor = conn.cursor()
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(scraped_data)")}
+    legacy = [(kind, f'{kind}{i}') for kind, count in (('phone', 4), ('email', 3))
+              for i in range(1, count + 1) if f'{kind}{i}' in columns]
+    if not legacy:
+        return
+    filled = ' OR '.join(f"COALESCE({column}, '') != ''" for _, column in legacy)
+    selected = ', '.join(column for _, column in legacy)
+    moved = 0
+    for row in cursor.execute(f"SELECT id, {selected} FROM scraped_data WHERE {filled}").fetchall():
+        record_id, values = row[0], row[1:]
+        positions = {'phone': 0, 'email': 0}
+        for (kind, _), value in zip(legacy, values):
+            if value:
+                cursor.execute("INSERT OR IGNORE INTO scraped_contacts (result_id, kind, position, value) "
+                               "VALUES (?, ?, ?, ?)", (record_id, kind, positions[kind], value))
+                positions[kind] += 1
+        moved += 1
+    if moved:
+        cursor.execute(f"UPDATE scraped_data SET {', '.join(f'{column} = NULL' for _, column in legacy)} "
+                       f"WHERE {filled}")
+        logger.info(f"Moved phones and emails of {moved} saved results into scraped_contacts")
+
+def empty_record(remarks, used_proxy):
+    return PersonRecord(remarks=remarks, proxy=used_proxy)
+
+def save_to_database(conn, row_id, record, commit=True):
+    cursor = conn.cursor()
+    cursor.execute('''
+    INSERT INTO scraped_data (input_row_id, tps_verified_name, tps_address, remarks, used_proxy)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (row_id, record.name, record.address, record.remarks, record.proxy))
+    result_id = cursor.lastrowid
+    contacts = [(result_id, 'phone', i, phone) for i, phone in enumerate(record.phones)]
+    contacts += [(result_id, 'email', i, email) for i, email in enumerate(record.emails)]
+    if contacts:
+        cursor.executemany("INSERT INTO scraped_contacts (result_id, kind, position, value) VALUES (?, ?, ?, ?)",
+                           contacts)
+    if commit:
+        conn.commit()
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from database import (
+    DB_PATH,
+    setup_database,
+    save_to_database,
+)
+from lookup_cache import put_cached_result
+from proxy_scheduler import save_proxy_health
+from checkpoint import Checkpoint, DONE
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class DatabaseWriter(threading.Thread):
+    """
+    Owns the only writing connection to tps_data.db (in WAL mode). Result, progress,
+    cache and proxy-health events are queued by any thread and committed in batched
+    transactions once batch_size events are waiting or flush_interval seconds have passed.
+    Progress events update the input file's Checkpoint, saved once per transaction.
+    Whatever is still queued is committed by close(), which also runs at interpreter exit.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=100, flush_interval=1.0):
+        super().__init__(name='DatabaseWriter', daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events = queue.Queue()
+        self.committed = 0
+        self.transactions = 0
+        self._checkpoints = {}
+        self._dirty_checkpoints = set()
+        self._closed = False
+        atexit.register(self.close)
+
+    def run(self):
+        conn = setup_database(self.db_path)
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if pending else None
+                try:
+                    event = self.events.get(timeout=timeout)
+                except queue.Empty:
+                    event = None
+                if event is _STOP:
+                    break
+                if isinstance(event, threading.Event):
+                    # flush() request: commit what we have and wake the caller
+                    self._commit(conn, pending)
+                    pending = []
+                    event.set()
+                    continue
+                if event is not None:
+                    if not pending:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.append(event)
+                if len(pending) >= self.batch_size or (pending and time.monotonic() >= deadline):
+                    self._commit(conn, pending)
+                    pending = []
+        finally:
+            self._commit(conn, pending)
+            conn.close()
+
+    def _apply(self, conn, event):
+        kind, args = event
+        if kind == 'result':
+            save_to_database(conn, *args, commit=False)
+        elif kind == 'progress':
+            row_index, input_file, status = args
+            checkpoint = self._checkpoints.get(input_file)
+            if checkpoint is None:
+                checkpoint = self._checkpoints[input_file] = Checkpoint.load(conn, input_file)
+            checkpoint.mark(row_index, status)
+            self._dirty_checkpoints.add(input_file)
+        elif kind == 'cache':
+            put_cached_result(conn, *args, commit=False)
+        elif kind == 'proxy_health':
+            save_proxy_health(conn, args[0], commit=False)
+
+    def _save_checkpoints(self, conn):
+        for input_file in self._dirty_checkpoints:
+            self._checkpoints[input_file].save(conn, commit=False)
+        self._dirty_checkpoints.clear()
+
+    def _commit(self, conn, events):
+        if not events:
+            return
+        try:
+            with conn:
+                for event in events:
+                    self._apply(conn, event)
+                self._save_checkpoints(conn)
+            self.committed += len(events)
+            self.transactions += 1
+        except Exception as e:
+            # Don't lose the whole batch for one bad event: replay them one by one
+            logger.error(f"Batch of {len(events)} writes failed, retrying individually: {str(e)}")
+            for event in events:
+                try:
+                    with conn:
+                        self._apply(conn, event)
+                        self._save_checkpoints(conn)
+                    self.committed += 1
+                    self.transactions += 1
+                except Exception as e:
+                    logger.error(f"Error writing {event[0]} event: {str(e)}")
+
+    def save(self, row_id, record):
+        self.events.put(('result', (row_id, record)))
+
+    def progress(self, row_index, input_file, status=DONE):
+        self.events.put(('progress', (row_index, input_file, status)))
+
+    def cache(self, key, data):
+        self.events.put(('cache', (key, data)))
+
+    def proxy_health(self, row):
+        self.events.put(('proxy_health', (row,)))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is committed; False if the writer isn't running or timed out."""
+        if not self.is_alive():
+            return False
+        done = threading.Event()
+        self.events.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.is_alive():
+            self.events.put(_STOP)
+            self.join()
+            logger.info(f"Database writer committed {self.committed} writes in {self.transactions} transactions")
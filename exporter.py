@@ -0,0 +1,128 @@
+import logging
+import os
+
+import pandas as pd
+
+from checkpoint import PENDING
+from person_record import PersonRecord
+from input_reader import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FILE = "TPS_output_data_ready_for_call_tools.csv"
+# Records keep every phone and email; the output CSV has room for this many of each
+EXPORT_PHONES = 4
+EXPORT_EMAILS = 3
+RESULT_COLUMNS = (['TPS Verified Name', 'TPS Address']
+                  + [f'Phone {i}' for i in range(1, EXPORT_PHONES + 1)]
+                  + [f'Email {i}' for i in range(1, EXPORT_EMAILS + 1)]
+                  + ['Remarks', 'Used Proxy'])
+
+def latest_results(conn, first_row, last_row):
+    """
+    Return {input_row_id: PersonRecord} for rows first_row..last_row, keeping only the
+    newest scraped_data entry when retries or reruns saved several for one row.
+    Walks idx_scraped_data_row in (input_row_id, id) order, so a later id just overwrites;
+    the contacts of the kept entries come from scraped_contacts in one more query.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT input_row_id, id, tps_verified_name, tps_address, remarks, used_proxy
+    FROM scraped_data
+    WHERE input_row_id BETWEEN ? AND ?
+    ORDER BY input_row_id, id
+    ''', (first_row, last_row))
+    latest = {row[0]: row[1:] for row in cursor}
+    records = {}
+    by_result = {}
+    for row_id, (result_id, name, address, remarks, proxy) in latest.items():
+        records[row_id] = by_result[result_id] = PersonRecord(name, address, remarks=remarks, proxy=proxy)
+    cursor.execute('''
+    SELECT c.result_id, c.kind, c.value
+    FROM scraped_data d JOIN scraped_contacts c ON c.result_id = d.id
+    WHERE d.input_row_id BETWEEN ? AND ?
+    ORDER BY c.result_id, c.kind, c.position
+    ''', (first_row, last_row))
+    for result_id, kind, value in cursor:
+        record = by_result.get(result_id)
+        if record is not None:
+            (record.phones if kind == 'phone' else record.emails).append(value)
+    return records
+
+def flatten(record):
+    """The output CSV's columns for one record: its first EXPORT_PHONES phones and EXPORT_EMAILS emails."""
+    phones = record.phones[:EXPORT_PHONES] + [''] * (EXPORT_PHONES - len(record.phones))
+    emails = record.emails[:EXPORT_EMAILS] + [''] * (EXPORT_EMAILS - len(record.emails))
+    return (record.name, record.address, *phones, *emails, record.remarks, record.proxy)
+
+class CsvExporter:
+    """
+    Writes the output CSV as input rows joined with their latest result, one input
+    chunk at a time. export_ready() appends the finished prefix of the input during
+    the run, so a crash still leaves everything exported up to that point; finish()
+    writes whatever is left. Memory stays at one chunk whatever the input size.
+    """
+
+    def __init__(self, input_file, output_file=OUTPUT_FILE, chunk_size=CHUNK_SIZE):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._chunks = None
+        self._chunk = None
+        self._header_written = False
+
+    def _start(self):
+        # Read as text so every chunk writes the input back exactly as it was, instead of
+        # each chunk guessing its own dtypes (and turning zips into floats where one is blank)
+        self._chunks = iter(pd.read_csv(self.input_file, chunksize=self.chunk_size,
+                                        dtype=str, keep_default_na=False))
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+    def _next_chunk(self):
+        if self._chunk is None or self._chunk.empty:
+            self._chunk = next(self._chunks, None)
+        return self._chunk
+
+    def _write(self, conn, rows):
+        results = latest_results(conn, int(rows.index[0]), int(rows.index[-1]))
+        empty = (None,) * len(RESULT_COLUMNS)
+        scraped = pd.DataFrame([flatten(results[index]) if index in results else empty for index in rows.index],
+                               index=rows.index, columns=RESULT_COLUMNS)
+        output = pd.concat([rows, scraped], axis=1)
+        output.to_csv(self.output_file, mode='a', header=not self._header_written, index=False)
+        self._header_written = True
+        self.rows_written += len(rows)
+
+    def _export(self, conn, is_finished=None):
+        if self._chunks is None:
+            self._start()
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return False
+            if is_finished is None:
+                ready = len(chunk)
+            else:
+                ready = 0
+                for index in chunk.index:
+                    if not is_finished(index):
+                        break
+                    ready += 1
+            if ready:
+                self._write(conn, chunk.iloc[:ready])
+                self._chunk = chunk.iloc[ready:]
+            if ready < len(chunk):
+                return True
+
+    def export_ready(self, conn, checkpoint):
+        """Append every not yet written row up to the first one the checkpoint still has pending."""
+        self._export(conn, lambda index: checkpoint.get(index) != PENDING)
+
+    def finish(self, conn):
+        self._export(conn)
+        logger.info(f"Data exported to {self.output_file} ({self.rows_written} rows)")
+
+def export_to_csv(conn, input_file, output_file=OUTPUT_FILE):
+    CsvExporter(input_file, output_file).finish(conn)
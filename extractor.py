@@ -0,0 +1,173 @@
+import bisect
+import logging
+import re
+
+from person_record import PersonRecord
+
+logger = logging.getLogger(__name__)
+
+# Details pages are a few tens of KB of text; anything beyond this is not a details page
+MAX_TEXT_LENGTH = 200000
+MAX_EMAIL_LENGTH = 254
+
+CURRENT_ADDRESS = 'Current Address'
+ADDRESS_INTRO = 'This is the most recently reported address'
+PHONE_HEADER = 'Phone Numbers'
+PHONE_INTRO = 'Includes the current and past phone numbers'
+EMAIL_HEADER = 'Email Addresses'
+EMAIL_INTRO = 'Includes all known email addresses'
+BACKGROUND_REPORT = 'Background Report'
+PROPERTY_DETAILS = 'Current Address Property Details'
+
+# Longest marker first so 'Current Address Property Details' is not split
+SECTION_MARKERS = sorted({
+    CURRENT_ADDRESS, ADDRESS_INTRO, PHONE_HEADER, PHONE_INTRO,
+    EMAIL_HEADER, EMAIL_INTRO, BACKGROUND_REPORT, PROPERTY_DETAILS,
+}, key=len, reverse=True)
+SECTION_MARKERS_RE = re.compile('|'.join(re.escape(m) for m in SECTION_MARKERS))
+
+NAME_RE = re.compile(r'[^,]+')
+ADDRESS_LINE_RE = re.compile(r'\n\n([^\n]+)')
+ADDRESS_PRICE_RE = re.compile(r'\$.*')
+WIRELESS_PHONE_RE = re.compile(r'\((\d{3})\) (\d{3})-(\d{4}) - Wireless')
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+def find_markers(text):
+    """One scan over the text collecting the start positions of every section marker."""
+    positions = {marker: [] for marker in SECTION_MARKERS}
+    for match in SECTION_MARKERS_RE.finditer(text):
+        marker = match.group(0)
+        positions[marker].append(match.start())
+        if marker == PROPERTY_DETAILS:
+            positions[CURRENT_ADDRESS].append(match.start())
+    return positions
+
+def _first_after(positions, marker, pos):
+    """Position of the first `marker` starting at or after pos, or -1."""
+    found = positions[marker]
+    i = bisect.bisect_left(found, pos)
+    return found[i] if i < len(found) else -1
+
+def _section(text, positions, header, intro, terminators):
+    """Text between the end of `intro` (after `header`) and the first terminator, or None."""
+    start = _first_after(positions, header, 0)
+    if start < 0:
+        return None
+    intro_at = _first_after(positions, intro, start + len(header))
+    if intro_at < 0:
+        return None
+    begin = intro_at + len(intro)
+    ends = [_first_after(positions, t, begin) for t in terminators]
+    ends = [e for e in ends if e >= 0]
+    return text[begin:min(ends)] if ends else text[begin:]
+
+def extract_person_details(text, current_proxy):
+    """
+    Extract name, current address and every wireless phone and email from the details
+    page text into a PersonRecord. Every pattern runs over bounded input with no nested
+    backtracking, so cost is linear in min(len(text), MAX_TEXT_LENGTH).
+    """
+    data = PersonRecord(remarks='Record found', proxy=current_proxy)
+
+    try:
+        if len(text) > MAX_TEXT_LENGTH:
+            logger.warning(f"Details text is {len(text)} chars, only the first {MAX_TEXT_LENGTH} are scanned")
+            text = text[:MAX_TEXT_LENGTH]
+        positions = find_markers(text)
+
+        # Name is everything before the first comma
+        stripped = text.strip()
+        name_match = NAME_RE.match(stripped)
+        if name_match and name_match.end() < len(stripped):
+            tps_verified_name = name_match.group(0).strip()
+            logger.info(f'Truepeoplesearch name = {tps_verified_name}')
+            data.name = tps_verified_name
+        else:
+            logger.warning("Could not find TPS Verified Name")
+
+        address_at = _first_after(positions, CURRENT_ADDRESS, 0)
+        intro_at = _first_after(positions, ADDRESS_INTRO, address_at + len(CURRENT_ADDRESS)) if address_at >= 0 else -1
+        address_match = ADDRESS_LINE_RE.search(text, intro_at + len(ADDRESS_INTRO)) if intro_at >= 0 else None
+        if address_match:
+            tps_address = ADDRESS_PRICE_RE.sub('', address_match.group(1).strip()).strip()
+            logger.info(f'Truepeoplesearch address = {tps_address}')
+            data.address = tps_address
+        else:
+            logger.warning("Could not find TPS Address")
+
+        phone_section = _section(text, positions, PHONE_HEADER, PHONE_INTRO, (EMAIL_HEADER, BACKGROUND_REPORT))
+        if phone_section is not None:
+            for phone_match in WIRELESS_PHONE_RE.finditer(phone_section):
+                phone_number = f"({phone_match.group(1)}) {phone_match.group(2)}-{phone_match.group(3)}"
+                if phone_number not in data.phones:
+                    data.phones.append(phone_number)
+                    logger.info(f'Phone {len(data.phones)} = {phone_number}')
+        else:
+            logger.warning("Could not find Phone Numbers section or its content.")
+
+        email_section = _section(text, positions, EMAIL_HEADER, EMAIL_INTRO, (PROPERTY_DETAILS,))
+        if email_section is not None:
+            # Only whitespace-separated tokens holding an '@' are matched, which keeps
+            # the email pattern from rescanning long runs of text
+            for token in email_section.split():
+                if '@' not in token or len(token) > MAX_EMAIL_LENGTH * 2:
+                    continue
+                for email in EMAIL_RE.findall(token):
+                    if email not in data.emails:
+                        data.emails.append(email)
+                        logger.info(f'Email {len(data.emails)} = {email}')
+        else:
+            logger.warning("Could not find Email Addresses section or its content.")
+
+    except Exception as e:
+        logger.error(f'Error in extract_person_details: {str(e)}')
+
+    return data
+
+# Walks #personDetails once in the page and returns every section in one round-trip,
+# instead of one get_text (and implicit wait) per XPath. In CDP mode execute_script runs
+# the text as a top-level script and only strips a `return` on its last line, so the
+# walk lives in a function called from that line.
+PERSON_DETAILS_SCRIPT = """
+var tpsPersonDetails = function () {
+    var root = document.querySelector('#personDetails');
+    if (!root) { return null; }
+    var clean = function (node) { return node ? node.textContent.replace(/\\s+/g, ' ').trim() : ''; };
+    var h1 = root.querySelector('h1');
+    var header = h1 ? h1.parentElement : root;
+    var spans = Array.prototype.slice.call(header.querySelectorAll(':scope > span'));
+    var livesIn = spans.filter(function (s) { return /^\\s*Lives in /.test(s.textContent); })[0] || spans[1];
+    var result = {name: clean(h1), address: clean(livesIn).replace(/^Lives in /, ''), phones: [], emails: [], sections: []};
+    var headings = root.querySelectorAll('.h5');
+    for (var i = 0; i < headings.length; i++) {
+        var title = clean(headings[i]);
+        var section = headings[i].parentElement;
+        result.sections.push(title);
+        if (title === 'Phone Numbers') {
+            var links = section.querySelectorAll('a[href*="/find/phone/"]');
+            for (var j = 0; j < links.length; j++) {
+                var type = links[j].parentElement.querySelector('.smaller');
+                result.phones.push({number: clean(links[j]), type: clean(type)});
+            }
+        } else if (title === 'Email Addresses') {
+            // One address per leaf element: the section's text runs them together on compact markup
+            var nodes = section.querySelectorAll('*');
+            for (var k = 0; k < nodes.length; k++) {
+                if (nodes[k].children.length) { continue; }
+                var email = clean(nodes[k]);
+                if (/^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$/.test(email) && result.emails.indexOf(email) === -1) {
+                    result.emails.push(email);
+                }
+            }
+        }
+    }
+    return result;
+};
+return tpsPersonDetails();
+"""
+
+def record_from_details(details, current_proxy, remarks='Record found'):
+    """Turn PERSON_DETAILS_SCRIPT's result into a PersonRecord (wireless phones only)."""
+    wireless = [p['number'] for p in details.get('phones', []) if 'Wireless' in p.get('type', '')]
+    return PersonRecord(details.get('name', ''), details.get('address', ''), wireless,
+                        details.get('emails', []), remarks, current_proxy)
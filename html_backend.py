@@ -0,0 +1,143 @@
+import logging
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        # selectolax before 1.0
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+try:
+    import lxml.html
+    import cssselect  # noqa: F401 - lxml's .cssselect() needs it
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+SELECTOLAX = 'selectolax'
+LXML = 'lxml'
+HTML_PARSER = 'html.parser'
+
+# Where the page checks and the extractor look: the details section and the results
+# header. Pages with neither (challenges, blocks, errors) are small and read whole.
+CONTENT_SELECTORS = ('#personDetails', '.record-count')
+SKIPPED_TAGS = ('script', 'style', 'noscript', 'template')
+
+class SelectolaxBackend:
+    """selectolax (lexbor, C): the fastest, used when installed."""
+    name = SELECTOLAX
+
+    def parse(self, html):
+        return SelectolaxParser(html)
+
+    def texts(self, doc, selector):
+        return [node.text(deep=True, separator='', strip=False) for node in doc.css(selector)]
+
+    def body_text(self, doc):
+        doc.strip_tags(list(SKIPPED_TAGS))
+        root = doc.body or doc.root
+        return root.text(deep=True, separator='', strip=False) if root is not None else ''
+
+    def attribute(self, doc, selector, name):
+        node = doc.css_first(selector)
+        return node.attributes.get(name) if node is not None else None
+
+class LxmlBackend:
+    """lxml.html (libxml2, C) with cssselect for the selectors."""
+    name = LXML
+
+    def parse(self, html):
+        if not html.strip():
+            return None
+        return lxml.html.document_fromstring(html)
+
+    def texts(self, doc, selector):
+        if doc is None:
+            return []
+        return [''.join(node.itertext()) for node in doc.cssselect(selector)]
+
+    def body_text(self, doc):
+        if doc is None:
+            return ''
+        body = doc.find('body')
+        root = body if body is not None else doc
+        return ''.join(root.xpath('.//text()[not(ancestor::script or ancestor::style '
+                                  'or ancestor::noscript or ancestor::template)]'))
+
+    def attribute(self, doc, selector, name):
+        if doc is None:
+            return None
+        found = doc.cssselect(selector)
+        return found[0].get(name) if found else None
+
+class SoupBackend:
+    """BeautifulSoup with the pure-Python html.parser: always there, the slowest."""
+    name = HTML_PARSER
+
+    def parse(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def texts(self, doc, selector):
+        return [node.get_text() for node in doc.select(selector)]
+
+    def body_text(self, doc):
+        root = doc.body or doc
+        for tag in root.find_all(SKIPPED_TAGS):
+            tag.decompose()
+        return root.get_text()
+
+    def attribute(self, doc, selector, name):
+        node = doc.select_one(selector)
+        return node.get(name) if node is not None else None
+
+BACKENDS = {SELECTOLAX: SelectolaxBackend, LXML: LxmlBackend, HTML_PARSER: SoupBackend}
+
+def available_backends():
+    """Installed backends, fastest first."""
+    names = []
+    if SelectolaxParser is not None:
+        names.append(SELECTOLAX)
+    if lxml is not None:
+        names.append(LXML)
+    names.append(HTML_PARSER)
+    return names
+
+def configure(name=None):
+    """Use the named backend, or the fastest installed one if name is None."""
+    global backend
+    available = available_backends()
+    if name is None:
+        name = available[0]
+    elif name not in available:
+        raise ValueError(f"HTML backend '{name}' is not installed (available: {', '.join(available)})")
+    backend = BACKENDS[name]()
+    logger.debug(f"Parsing pages with {name}")
+    return backend
+
+backend = None
+configure()
+
+def page_text(html):
+    """
+    The text page checks and extraction need: the <title>, then the details section or
+    results header if the page has one, otherwise the whole body without scripts.
+    """
+    doc = backend.parse(html or '')
+    parts = backend.texts(doc, 'title')[:1]
+    content = [text for selector in CONTENT_SELECTORS for text in backend.texts(doc, selector)]
+    parts.extend(content or [backend.body_text(doc)])
+    return '\n'.join(parts)
+
+def first_attribute(html, selectors, name):
+    """`name` of the first element matching one of `selectors`, tried in order, or None."""
+    doc = backend.parse(html or '')
+    for selector in selectors:
+        value = backend.attribute(doc, selector, name)
+        if value is not None:
+            return value
+    return None
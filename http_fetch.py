@@ -0,0 +1,144 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin
+import argparse
+import logging
+import threading
+
+from database import empty_record
+import html_backend
+import parse_pool
+from page_state import RESULT_COUNT_RE, RESULTS, NOT_FOUND, DETAILS
+from rate_limiter import throttle
+from lookup_cache import note_not_found
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = 'https://www.truepeoplesearch.com'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+DETAILS_LINK_SELECTORS = [
+    'div.col-md-4.hidden-mobile.text-center.align-self-center > a[href]',
+    'a.detail-link[href]',
+]
+
+def results_url(name, address, base_url=BASE_URL):
+    return f'{base_url}/results?name={name.replace(" ", "%20")}&citystatezip={address.replace(" ", "%20")}'
+
+def requests_proxy(proxy):
+    """ip:port:username:password -> the proxies mapping requests expects."""
+    ip, port, username, password = proxy.split(':')
+    url = f"http://{username}:{password}@{ip}:{port}"
+    return {'http': url, 'https': url}
+
+def find_details_link(html):
+    return html_backend.first_attribute(html, DETAILS_LINK_SELECTORS, 'href')
+
+class HttpFetcher:
+    """Pooled HTTP session bound to one proxy, used before falling back to the browser."""
+
+    def __init__(self, proxy=None, base_url=BASE_URL, timeout=20, pool_size=4):
+        self.proxy = proxy
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if proxy:
+            self.session.proxies.update(requests_proxy(proxy))
+
+    def fetch(self, url):
+        # Challenge and block pages come back as 403/503; they are classified, not raised
+        throttle(self.proxy)
+        response = self.session.get(url, timeout=self.timeout)
+        return parse_pool.pool.snapshot(response.text)
+
+    def lookup(self, name, address, current_proxy, attempt=None):
+        """
+        Run the results -> details lookup over HTTP. Returns a PersonRecord like the
+        browser path, or None when the page is a challenge (or anything unexpected)
+        and the row has to go through the browser. A not-found page is noted on attempt.
+        """
+        try:
+            snapshot = self.fetch(results_url(name, address, self.base_url))
+        except requests.RequestException as e:
+            logger.warning(f"HTTP fetch failed, falling back to browser: {e}")
+            return None
+        if snapshot.kind not in (RESULTS, NOT_FOUND):
+            logger.info(f"HTTP results page is '{snapshot.kind}', escalating to browser")
+            return None
+
+        count_match = RESULT_COUNT_RE.search(snapshot.text)
+        remarks = count_match.group(0).strip() if count_match else f'Record Not Found against {name}.'
+        number_found = int(count_match.group(1)) if count_match else 0
+        logger.info(remarks)
+        if number_found == 0:
+            note_not_found(attempt)
+        if number_found == 0 or number_found > 6:
+            return empty_record(remarks, current_proxy)
+
+        link = find_details_link(snapshot.html)
+        if link is None:
+            logger.info("No details link in HTTP results page, escalating to browser")
+            return None
+        try:
+            details = self.fetch(urljoin(self.base_url + '/', link))
+        except requests.RequestException as e:
+            logger.warning(f"HTTP details fetch failed, falling back to browser: {e}")
+            return None
+        if details.kind != DETAILS:
+            # Challenges and blocks, but also error pages and interstitials with no record on them
+            logger.info(f"HTTP details page is '{details.kind}', escalating to browser")
+            return None
+        data = parse_pool.pool.extract(details.text, current_proxy)
+        logger.info('Record found over HTTP! Going to next...')
+        return data
+
+    def load_browser_cookies(self, sb):
+        """Copy the browser's cookies (including challenge clearance) into this session."""
+        try:
+            cookies = sb.get_cookies()
+        except Exception as e:
+            logger.warning(f"Could not read browser cookies: {e}")
+            return 0
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        return len(cookies)
+
+class HttpFetcherPool:
+    """One HttpFetcher per proxy, shared by the main loop and the worker threads."""
+
+    def __init__(self, base_url=BASE_URL):
+        self.base_url = base_url
+        self._fetchers = {}
+        self._lock = threading.Lock()
+
+    def get(self, proxy):
+        with self._lock:
+            if proxy not in self._fetchers:
+                self._fetchers[proxy] = HttpFetcher(proxy, self.base_url)
+            return self._fetchers[proxy]
+
+    def lookup(self, name, address, proxy, attempt=None):
+        return self.get(proxy).lookup(name, address, proxy, attempt)
+
+    def load_browser_cookies(self, proxy, sb):
+        return self.get(proxy).load_browser_cookies(sb)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Look up one person over the HTTP fast path')
+    parser.add_argument('name')
+    parser.add_argument('address')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--proxy', default=None, help='ip:port:username:password')
+    args = parser.parse_args()
+    print(HttpFetcher(args.proxy, args.base_url).lookup(args.name, args.address, args.proxy))
@@ -0,0 +1,45 @@
+import pandas as pd
+import logging
+
+from checkpoint import DONE
+
+logger = logging.getLogger(__name__)
+
+NAME_COLUMN = 'Name (Formatted)'
+ADDRESS_COLUMN = 'Contact Address (City, State)'
+CHUNK_SIZE = 5000
+
+def iter_input_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """
+    Stream the input CSV in chunks holding only the name and city/state columns.
+    The chunk index continues across chunks, so it is the same row id a full
+    pd.read_csv would give.
+    """
+    return pd.read_csv(input_file, usecols=[NAME_COLUMN, ADDRESS_COLUMN], chunksize=chunk_size)
+
+def count_input_rows(input_file, chunk_size=CHUNK_SIZE):
+    return sum(len(chunk) for chunk in iter_input_chunks(input_file, chunk_size))
+
+def missing_input(name, address):
+    """Remarks for a row whose name or address is empty (NaN in pandas), or None if both are set."""
+    missing = [label for label, value in (('name', name), ('address', address))
+               if value is None or pd.isna(value) or not str(value).strip()]
+    return f"Missing {' and '.join(missing)} in the input file" if missing else None
+
+def iter_pending_rows(input_file, checkpoint=None, chunk_size=CHUNK_SIZE, on_missing=None):
+    """
+    Yield (row_id, name, address) for every row the checkpoint doesn't mark as done.
+    Rows without a name or address are skipped; on_missing(row_id, remarks) is told so
+    they can be marked failed.
+    """
+    for chunk in iter_input_chunks(input_file, chunk_size):
+        for index, name, address in zip(chunk.index, chunk[NAME_COLUMN], chunk[ADDRESS_COLUMN]):
+            if checkpoint is not None and checkpoint.get(index) == DONE:
+                continue
+            remarks = missing_input(name, address)
+            if remarks is not None:
+                logger.warning(f"Skipping row {index + 1}: {remarks}")
+                if on_missing is not None:
+                    on_missing(int(index), remarks)
+                continue
+            yield int(index), name, address
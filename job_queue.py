@@ -0,0 +1,293 @@
+import contextlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+from checkpoint import DONE, FAILED
+from person_record import PersonRecord
+from input_reader import missing_input
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PATH = 'tps_queue.db'
+DEFAULT_RANGE_SIZE = 50
+DEFAULT_LEASE_SECONDS = 900
+# A range whose lease expired this many times is given up and its rows marked failed
+MAX_LEASE_ATTEMPTS = 5
+
+PENDING = 'pending'
+LEASED = 'leased'
+COMPLETE = 'done'
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class Lease:
+    """One claimed row range: its rows are (input_row_id, name, address)."""
+    __slots__ = ('range_id', 'token', 'input_file', 'rows', 'expires_at')
+
+    def __init__(self, range_id, token, input_file, rows, expires_at):
+        self.range_id = range_id
+        self.token = token
+        self.input_file = input_file
+        self.rows = rows
+        self.expires_at = expires_at
+
+class JobQueue:
+    """
+    Row ranges of input files leased to worker processes through one SQLite file (WAL
+    mode, so it works for any number of processes on one host or on a volume with
+    working file locks). The coordinator enqueues ranges with the names to look up;
+    workers claim a range for lease_seconds, renew the lease while they scrape and
+    complete it with their results, which the coordinator then takes and saves.
+    A lease that is not renewed in time expires and the next claim hands the range out
+    again; the first worker to complete a range wins.
+    """
+
+    def __init__(self, path=QUEUE_PATH, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=MAX_LEASE_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit; writes take the lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_ranges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            input_file TEXT,
+            first_row INTEGER,
+            last_row INTEGER,
+            status TEXT,
+            worker TEXT,
+            lease_token TEXT,
+            lease_expires REAL,
+            attempts INTEGER DEFAULT 0,
+            updated_at REAL
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_job_ranges_status ON job_ranges (status, lease_expires)")
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_rows (
+            range_id INTEGER,
+            input_row_id INTEGER,
+            name TEXT,
+            address TEXT,
+            PRIMARY KEY (range_id, input_row_id)
+        ) WITHOUT ROWID
+        ''')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_results (
+            input_file TEXT,
+            input_row_id INTEGER,
+            result TEXT,
+            success INTEGER,
+            worker TEXT,
+            imported INTEGER DEFAULT 0,
+            PRIMARY KEY (input_file, input_row_id)
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_job_results_imported ON job_results (input_file, imported)")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def reset(self, input_file):
+        """Forget every range, row and result of input_file."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM job_rows WHERE range_id IN (SELECT id FROM job_ranges WHERE input_file = ?)",
+                         (input_file,))
+            conn.execute("DELETE FROM job_ranges WHERE input_file = ?", (input_file,))
+            conn.execute("DELETE FROM job_results WHERE input_file = ?", (input_file,))
+
+    def enqueue(self, input_file, rows, range_size=DEFAULT_RANGE_SIZE):
+        """
+        Split (input_row_id, name, address) rows into ranges of range_size rows; returns the
+        range count. Rows missing a name or address are not queued but stored as failed results.
+        """
+        ranges = 0
+        batch = []
+        missing = []
+
+        def flush(conn):
+            cursor = conn.execute("INSERT INTO job_ranges (input_file, first_row, last_row, status, updated_at) "
+                                  "VALUES (?, ?, ?, ?, ?)", (input_file, batch[0][0], batch[-1][0], PENDING, time.time()))
+            conn.executemany("INSERT INTO job_rows (range_id, input_row_id, name, address) VALUES (?, ?, ?, ?)",
+                             [(cursor.lastrowid, row_id, str(name), str(address)) for row_id, name, address in batch])
+
+        with self._transaction() as conn:
+            for row in rows:
+                remarks = missing_input(row[1], row[2])
+                if remarks is not None:
+                    missing.append((input_file, row[0], json.dumps(PersonRecord(remarks=remarks).as_dict()), 0, None))
+                    continue
+                batch.append(row)
+                if len(batch) >= range_size:
+                    flush(conn)
+                    ranges += 1
+                    batch = []
+            if batch:
+                flush(conn)
+                ranges += 1
+            conn.executemany("INSERT OR REPLACE INTO job_results (input_file, input_row_id, result, success, worker, "
+                             "imported) VALUES (?, ?, ?, ?, ?, 0)", missing)
+        if missing:
+            logger.warning(f"{len(missing)} rows of {input_file} have no name or address, saved as failed")
+        logger.info(f"Queued {ranges} ranges of up to {range_size} rows from {input_file}")
+        return ranges
+
+    def claim(self, worker):
+        """Lease the oldest pending (or expired) range to worker, or None if nothing is claimable."""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._transaction() as conn:
+            row = conn.execute('''
+            SELECT id, input_file, status, worker FROM job_ranges
+            WHERE (status = ? OR (status = ? AND lease_expires < ?)) AND attempts < ?
+            ORDER BY id LIMIT 1
+            ''', (PENDING, LEASED, now, self.max_attempts)).fetchone()
+            if row is None:
+                return None
+            range_id, input_file, status, previous_worker = row
+            if status == LEASED:
+                logger.warning(f"Lease on range {range_id} held by {previous_worker} expired, reassigning to {worker}")
+            expires_at = now + self.lease_seconds
+            conn.execute("UPDATE job_ranges SET status = ?, worker = ?, lease_token = ?, lease_expires = ?, "
+                         "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                         (LEASED, worker, token, expires_at, now, range_id))
+        rows = self.conn.execute("SELECT input_row_id, name, address FROM job_rows WHERE range_id = ? "
+                                 "ORDER BY input_row_id", (range_id,)).fetchall()
+        return Lease(range_id, token, input_file, rows, expires_at)
+
+    def renew(self, lease):
+        """Push the lease's expiry out again; False if it was lost to another worker."""
+        expires_at = time.time() + self.lease_seconds
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE job_ranges SET lease_expires = ?, updated_at = ? "
+                                  "WHERE id = ? AND lease_token = ? AND status = ?",
+                                  (expires_at, time.time(), lease.range_id, lease.token, LEASED))
+        if cursor.rowcount:
+            lease.expires_at = expires_at
+            return True
+        logger.warning(f"Lease on range {lease.range_id} was lost, finishing it anyway")
+        return False
+
+    def release(self, lease):
+        """Hand a range back unfinished (e.g. on shutdown) without counting it as an attempt."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE job_ranges SET status = ?, lease_token = NULL, attempts = attempts - 1, "
+                         "updated_at = ? WHERE id = ? AND lease_token = ? AND status = ?",
+                         (PENDING, time.time(), lease.range_id, lease.token, LEASED))
+
+    def complete(self, lease, results, worker):
+        """
+        Store {input_row_id: (PersonRecord, success)} for the lease and mark its range done.
+        False, with nothing stored, if another worker already completed the range.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM job_ranges WHERE id = ?", (lease.range_id,)).fetchone()
+            if row is None or row[0] == COMPLETE:
+                logger.warning(f"Range {lease.range_id} was already completed elsewhere, dropping these results")
+                return False
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_results (input_file, input_row_id, result, success, worker, imported) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                [(lease.input_file, row_id, json.dumps(record.as_dict()), int(success), worker)
+                 for row_id, (record, success) in results.items()])
+            conn.execute("UPDATE job_ranges SET status = ?, lease_token = NULL, updated_at = ? WHERE id = ?",
+                         (COMPLETE, time.time(), lease.range_id))
+        return True
+
+    def pending_results(self, input_file):
+        """
+        Every result not imported yet, as (input_row_id, PersonRecord, success). They stay
+        pending until mark_imported(), so the coordinator only marks what it has committed.
+        """
+        rows = self.conn.execute("SELECT input_row_id, result, success FROM job_results "
+                                 "WHERE input_file = ? AND imported = 0", (input_file,)).fetchall()
+        return [(row_id, PersonRecord.from_dict(json.loads(result)), bool(success)) for row_id, result, success in rows]
+
+    def has_pending_results(self, input_file):
+        return self.conn.execute("SELECT 1 FROM job_results WHERE input_file = ? AND imported = 0 LIMIT 1",
+                                 (input_file,)).fetchone() is not None
+
+    def mark_imported(self, input_file, row_ids):
+        with self._transaction() as conn:
+            conn.executemany("UPDATE job_results SET imported = 1 WHERE input_file = ? AND input_row_id = ?",
+                             [(input_file, row_id) for row_id in row_ids])
+
+    def _given_up_clause(self):
+        return "(attempts >= ? AND (status = ? OR (status = ? AND lease_expires < ?)))"
+
+    def given_up_rows(self, input_file):
+        """Rows of ranges that expired max_attempts times without being completed."""
+        return [row[0] for row in self.conn.execute(f'''
+        SELECT r.input_row_id FROM job_ranges j JOIN job_rows r ON r.range_id = j.id
+        WHERE j.input_file = ? AND j.status != ? AND {self._given_up_clause()}
+        ''', (input_file, COMPLETE, self.max_attempts, PENDING, LEASED, time.time()))]
+
+    def counts(self, input_file=None):
+        """Ranges per state: pending, leased, expired, done and given_up."""
+        now = time.time()
+        counts = {'pending': 0, 'leased': 0, 'expired': 0, 'done': 0, 'given_up': 0}
+        query = "SELECT status, lease_expires, attempts FROM job_ranges"
+        params = ()
+        if input_file is not None:
+            query += " WHERE input_file = ?"
+            params = (input_file,)
+        for status, lease_expires, attempts in self.conn.execute(query, params):
+            expired = status == LEASED and lease_expires < now
+            if status != COMPLETE and attempts >= self.max_attempts and (status == PENDING or expired):
+                counts['given_up'] += 1
+            elif expired:
+                counts['expired'] += 1
+            else:
+                counts[status] += 1
+        return counts
+
+    def is_finished(self, input_file=None):
+        counts = self.counts(input_file)
+        return not (counts['pending'] or counts['leased'] or counts['expired'])
+
+    def close(self):
+        self.conn.close()
+
+class LeaseCollector:
+    """
+    Stands in for the DatabaseWriter while a worker scrapes one lease: results and row
+    statuses are kept for JobQueue.complete, lookup cache entries go on to the
+    worker's own `writer`.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.records = {}
+        self.statuses = {}
+
+    def save(self, row_id, record):
+        self.records[row_id] = record
+
+    def progress(self, row_index, input_file, status=DONE):
+        self.statuses[row_index] = status
+
+    def cache(self, key, data):
+        self.writer.cache(key, data)
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def results(self):
+        """{input_row_id: (PersonRecord, success)} for every row with a saved record."""
+        return {row_id: (record, self.statuses.get(row_id, DONE) != FAILED)
+                for row_id, record in self.records.items()}
@@ -0,0 +1,110 @@
+import json
+import logging
+import re
+import time
+
+from person_record import PersonRecord
+from page_state import NOT_FOUND
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_HOURS = 720
+# Nobody by that name today may be listed next week, so misses expire sooner than hits
+DEFAULT_NEGATIVE_TTL_HOURS = 72
+
+# Remarks of a search the site answered with no one: the scrapers' own not-found
+# message, or a results header counting 0 records
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _normalize(value):
+    if value is None or value != value:  # None or NaN from pandas
+        return ''
+    value = _PUNCTUATION_RE.sub(' ', str(value).lower())
+    return _WHITESPACE_RE.sub(' ', value).strip()
+
+def normalize_lookup_key(name, city_state):
+    """'John A. Smith', 'Gloucester,  MA' -> 'john a smith|gloucester ma'"""
+    return f"{_normalize(name)}|{_normalize(city_state)}"
+
+def group_duplicate_rows(rows):
+    """
+    Collapse (index, name, address) rows that search for the same person. `rows` can be
+    any iterable, e.g. a streaming reader. Returns (row_ids, name, address) in order of
+    first appearance.
+    """
+    groups = {}
+    for index, name, address in rows:
+        key = normalize_lookup_key(name, address)
+        if key in groups:
+            groups[key][0].append(index)
+        else:
+            groups[key] = ([index], name, address)
+    return list(groups.values())
+
+def is_positive_result(record):
+    return record.is_positive()
+
+def note_not_found(attempt):
+    """Tell the lookup loop this attempt's empty record comes from a page saying there are no records."""
+    if attempt is not None:
+        attempt['page_kind'] = NOT_FOUND
+
+def is_negative_result(record, attempt=None):
+    """
+    A search the site answered with no one, as opposed to a failed or ambiguous lookup:
+    only the scraper knows, from the page it read (see note_not_found).
+    """
+    return not record.is_positive() and (attempt or {}).get('page_kind') == NOT_FOUND
+
+def is_cacheable_result(record, attempt=None):
+    """Real hits and real misses are cached; failed and too-many-results rows are looked up again next run."""
+    return is_positive_result(record) or is_negative_result(record, attempt)
+
+def get_cached_result(conn, key, ttl_hours=DEFAULT_TTL_HOURS, negative_ttl_hours=DEFAULT_NEGATIVE_TTL_HOURS):
+    """
+    The cached record for key, or None if there is none or it is older than its TTL:
+    ttl_hours for hits, negative_ttl_hours for not-found results. A TTL of 0 ignores
+    those entries, and ttl_hours 0 disables the cache altogether.
+    """
+    if ttl_hours <= 0:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("SELECT result, cached_at FROM lookup_cache WHERE cache_key = ?", (key,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    record = PersonRecord.from_dict(json.loads(row[0]))
+    ttl = ttl_hours if record.is_positive() else negative_ttl_hours
+    if ttl <= 0 or time.time() - row[1] > ttl * 3600:
+        return None
+    return record
+
+def put_cached_result(conn, key, record, commit=True):
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR REPLACE INTO lookup_cache (cache_key, result, cached_at) VALUES (?, ?, ?)",
+                   (key, json.dumps(record.as_dict()), time.time()))
+    if commit:
+        conn.commit()
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        # Hits that were cached not-found results
+        self.negative_hits = 0
+        self.misses = 0
+        self.duplicate_rows = 0
+
+    def record_hit(self, record):
+        self.hits += 1
+        if not record.is_positive():
+            self.negative_hits += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"lookup cache hit rate {self.hit_rate():.1%} ({self.hits} hits, "
+                f"{self.negative_hits} of them not found, {self.misses} misses), "
+                f"{self.duplicate_rows} duplicate rows filled without a lookup")
@@ -0,0 +1,200 @@
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = 'scrape_metrics.jsonl'
+# Rows the rolling aggregates are computed over
+DEFAULT_WINDOW = 500
+
+# Phases of one row, summed over all its attempts
+BROWSER_START = 'browser_start'
+HTTP_LOOKUP = 'http_lookup'
+PACING = 'pacing'
+NAVIGATION = 'navigation'
+CAPTCHA = 'captcha'
+CONSENT = 'consent'
+DETAILS_CLICK = 'details_click'
+EXTRACTION = 'extraction'
+DB_WRITE = 'db_write'
+
+def add_phase(phases, phase, seconds):
+    phases[phase] = phases.get(phase, 0.0) + seconds
+
+@contextlib.contextmanager
+def timed_phase(attempt, phase):
+    """Add the time spent in the block to attempt['phases'][phase]; a no-op without an attempt dict."""
+    if attempt is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(attempt.setdefault('phases', {}), phase, time.perf_counter() - started)
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+class RowTiming:
+    """
+    Timings of one input row (and the duplicate rows sharing its lookup) across all its
+    attempts. new_attempt() returns the attempt dict scrape_person_data fills in; its
+    phases are added straight into the row's.
+    """
+
+    def __init__(self, row_ids):
+        self.row = row_ids[0] + 1
+        self.rows = len(row_ids)
+        self.started = time.time()
+        self._perf_started = time.perf_counter()
+        self.phases = {}
+        self.attempts = []
+
+    def new_attempt(self):
+        return {'phases': self.phases}
+
+    def end_attempt(self, attempt, proxy, outcome, seconds):
+        """outcome: 'ok', 'empty' (no data), 'blocked' or 'error'."""
+        record = {'proxy': proxy, 'outcome': outcome, 'seconds': round(seconds, 3),
+                  'challenges': attempt.get('challenges', 0)}
+        if attempt.get('failure'):
+            # retry_policy's class of the failure
+            record['failure'] = attempt['failure']
+        self.attempts.append(record)
+
+    @contextlib.contextmanager
+    def phase(self, phase):
+        with timed_phase({'phases': self.phases}, phase):
+            yield
+
+    def as_record(self, outcome, proxy):
+        return {
+            'time': round(self.started, 3),
+            'row': self.row,
+            'rows': self.rows,
+            'proxy': proxy,
+            'outcome': outcome,
+            'seconds': round(time.perf_counter() - self._perf_started, 3),
+            'phases': {phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+            'attempts': self.attempts,
+        }
+
+class MetricsRecorder:
+    """
+    Collects finished RowTimings: each is appended as one JSON line to `path` (if set)
+    and kept in a rolling window of the last `window` rows for p50/p95 per phase,
+    rows/hour and block rate per proxy. Safe to share between worker threads.
+    """
+
+    def __init__(self, path=None, window=DEFAULT_WINDOW):
+        self.path = path
+        self._recent = collections.deque(maxlen=window)
+        self._file = open(path, 'a', buffering=1, encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.total_rows = 0
+        self.outcomes = collections.Counter()
+
+    def row(self, row_ids):
+        return RowTiming(row_ids)
+
+    def finish(self, timing, outcome, proxy):
+        """outcome: 'found', 'not_found', 'failed' or 'cached'."""
+        record = timing.as_record(outcome, proxy)
+        with self._lock:
+            self._recent.append(record)
+            self.total_rows += record['rows']
+            self.outcomes[outcome] += record['rows']
+            if self._file is not None:
+                self._file.write(json.dumps(record) + '\n')
+        return record
+
+    def aggregates(self):
+        with self._lock:
+            recent = list(self._recent)
+            total_rows = self.total_rows
+            outcomes = dict(self.outcomes)
+        phases = {}
+        for record in recent:
+            for phase, seconds in record['phases'].items():
+                phases.setdefault(phase, []).append(seconds)
+        proxies = {}
+        for record in recent:
+            for attempt in record['attempts']:
+                stats = proxies.setdefault(attempt['proxy'], {'attempts': 0, 'blocks': 0})
+                stats['attempts'] += 1
+                stats['blocks'] += attempt['outcome'] == 'blocked'
+        for stats in proxies.values():
+            stats['block_rate'] = round(stats['blocks'] / stats['attempts'], 3)
+        row_seconds = sorted(r['seconds'] for r in recent)
+        window_rows = sum(r['rows'] for r in recent)
+        window_span = (recent[-1]['time'] + recent[-1]['seconds'] - recent[0]['time']) if recent else 0
+        elapsed = time.time() - self.started
+        return {
+            'rows': total_rows,
+            'outcomes': outcomes,
+            'rows_per_hour': round(total_rows / elapsed * 3600, 1) if elapsed else 0.0,
+            'window_rows': window_rows,
+            'window_rows_per_hour': round(window_rows / window_span * 3600, 1) if window_span > 0 else 0.0,
+            'row_seconds': {'p50': _percentile(row_seconds, 0.5), 'p95': _percentile(row_seconds, 0.95)},
+            'phases': {phase: {'p50': round(_percentile(sorted(values), 0.5), 4),
+                               'p95': round(_percentile(sorted(values), 0.95), 4)}
+                       for phase, values in phases.items()},
+            'proxies': proxies,
+        }
+
+    def summary(self):
+        agg = self.aggregates()
+        phases = ', '.join(f"{phase} {p['p50']:.1f}/{p['p95']:.1f}s" for phase, p in agg['phases'].items())
+        blocked = sum(p['blocks'] for p in agg['proxies'].values())
+        attempts = sum(p['attempts'] for p in agg['proxies'].values())
+        block_rate = blocked / attempts if attempts else 0.0
+        return (f"{agg['rows']} rows at {agg['rows_per_hour']:.0f} rows/hour "
+                f"(last {agg['window_rows']}: {agg['window_rows_per_hour']:.0f}/hour), "
+                f"row p50/p95 {agg['row_seconds']['p50']:.1f}/{agg['row_seconds']['p95']:.1f}s, "
+                f"block rate {block_rate:.1%}; phase p50/p95: {phases or 'none'}")
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve aggregates() as JSON on http://host:port/metrics from a background thread."""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(recorder.aggregates()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        logger.info(f"Serving scrape metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+# Shared by the main loop and the worker threads, like rate_limiter.limiter; cap.py
+# replaces it to write the per-row file
+recorder = MetricsRecorder()
+
+def configure(path=METRICS_FILE, window=DEFAULT_WINDOW):
+    global recorder
+    recorder = MetricsRecorder(path, window)
+    return recorder
@@ -0,0 +1,91 @@
+import logging
+import re
+
+import html_backend
+
+logger = logging.getLogger(__name__)
+
+BLOCKED = 'blocked'
+PRESS_HOLD = 'press_hold'
+CLICK_CAPTCHA = 'click_captcha'
+CONSENT = 'consent'
+RESULTS = 'results'
+DETAILS = 'details'
+NOT_FOUND = 'not_found'
+UNKNOWN = 'unknown'
+
+CHALLENGE_KINDS = (PRESS_HOLD, CLICK_CAPTCHA)
+
+BLOCK_MARKERS = ("Access Denied", "Sorry, you have been blocked", "This site can't be reached")
+PRESS_HOLD_MARKER = "Access to this page has been denied"
+CLICK_CAPTCHA_MARKERS = ("Just a moment...", "Captcha")
+
+RESULT_COUNT_RE = re.compile(r'^[ \t]*(\d+)\s+records?\b[^\n]*', re.IGNORECASE | re.MULTILINE)
+NOT_FOUND_RE = re.compile(r'no (?:records|results) found', re.IGNORECASE)
+
+class PageSnapshot:
+    """
+    One page source for one navigation state. The source is fetched once, parsed at most
+    once, and the page is classified in a single pass so every caller can share it.
+    kind and text can be passed in when they were worked out elsewhere (parse_pool.py).
+    """
+
+    def __init__(self, html, kind=None, text=None):
+        self.html = html or ''
+        self._text = text
+        self._kind = kind
+
+    @classmethod
+    def capture(cls, sb):
+        return cls(sb.get_page_source())
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = html_backend.page_text(self.html)
+        return self._text
+
+    @property
+    def kind(self):
+        if self._kind is None:
+            self._kind = classify_page(self)
+        return self._kind
+
+    @property
+    def has_consent(self):
+        return 'fc-dialog' in self.html
+
+    @property
+    def is_blocked(self):
+        return self.kind == BLOCKED
+
+    @property
+    def is_challenge(self):
+        return self.kind in CHALLENGE_KINDS
+
+def classify_page(snapshot):
+    """Classify a snapshot as blocked, a captcha, details, results, not found or consent."""
+    text = snapshot.text
+    if any(marker in text for marker in BLOCK_MARKERS):
+        return BLOCKED
+    if PRESS_HOLD_MARKER in text:
+        return PRESS_HOLD
+    if any(marker in text for marker in CLICK_CAPTCHA_MARKERS):
+        return CLICK_CAPTCHA
+    if 'id="personDetails"' in snapshot.html or "id='personDetails'" in snapshot.html:
+        return DETAILS
+    match = RESULT_COUNT_RE.search(text)
+    if match:
+        return RESULTS if int(match.group(1)) > 0 else NOT_FOUND
+    if NOT_FOUND_RE.search(text):
+        return NOT_FOUND
+    if snapshot.has_consent:
+        return CONSENT
+    return UNKNOWN
+
+def result_count(header):
+    """The number of records a results header such as "3 records found" reports, or None without one."""
+    words = header.split() if header else []
+    if not words or not words[0].replace(',', '').isdigit():
+        return None
+    return int(words[0].replace(',', ''))
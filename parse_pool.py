@@ -0,0 +1,101 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import time
+
+from extractor import extract_person_details
+from page_state import PageSnapshot
+
+logger = logging.getLogger(__name__)
+
+def analyze_page(html):
+    """(kind, text) of a page source; runs in the pool's worker processes."""
+    snapshot = PageSnapshot(html)
+    return snapshot.kind, snapshot.text
+
+class ParsePool:
+    """
+    The parse and extract stage: page sources go in, classified snapshots and extracted
+    PersonRecords come out. With processes > 0 the work runs in that many worker
+    processes, so the threads (or the event loop) driving browsers neither spend their
+    time on it nor hold the GIL while other browsers wait; with 0 it runs inline in
+    the caller, as before. Time callers spend waiting on the stage is summed in
+    `wait_seconds`.
+    """
+
+    def __init__(self, processes=0):
+        self.processes = processes
+        self.executor = None
+        if processes > 0:
+            # spawn: forking would copy the browser, writer and metrics threads' locks mid-use
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context('spawn'))
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.wait_seconds = 0.0
+
+    def _record(self, started):
+        with self._lock:
+            self.pages += 1
+            self.wait_seconds += time.perf_counter() - started
+
+    def _run(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            if self.executor is None:
+                return fn(*args)
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self._record(started)
+
+    async def _run_async(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            if self.executor is None:
+                # Inline still means off the event loop, so one big page doesn't stall the other tabs
+                return await asyncio.to_thread(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self._record(started)
+
+    def snapshot(self, html):
+        """A PageSnapshot of html with its kind and text already worked out."""
+        kind, text = self._run(analyze_page, html)
+        return PageSnapshot(html, kind, text)
+
+    def capture(self, sb):
+        return self.snapshot(sb.get_page_source())
+
+    def extract(self, text, current_proxy):
+        return self._run(extract_person_details, text, current_proxy)
+
+    async def snapshot_async(self, html):
+        kind, text = await self._run_async(analyze_page, html)
+        return PageSnapshot(html, kind, text)
+
+    async def extract_async(self, text, current_proxy):
+        return await self._run_async(extract_person_details, text, current_proxy)
+
+    def summary(self):
+        with self._lock:
+            pages, waited = self.pages, self.wait_seconds
+        where = f"{self.processes} processes" if self.executor is not None else "inline"
+        average = waited / pages * 1000 if pages else 0.0
+        return f"{pages} pages parsed {where}, {average:.1f} ms average wait"
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+# Shared by the main loop, the worker threads and the async pipeline, like
+# metrics.recorder; cap.py replaces it for --parse-processes
+pool = ParsePool()
+
+def configure(processes=0):
+    global pool
+    pool.close()
+    pool = ParsePool(processes)
+    return pool
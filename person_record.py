@@ -0,0 +1,52 @@
+def _unique(values):
+    """Non-empty values in first-seen order, duplicates dropped."""
+    seen = set()
+    result = []
+    for value in values:
+        if value and value not in seen:
+            seen.add(value)
+            result.append(value)
+    return result
+
+class PersonRecord:
+    """
+    One lookup result: the verified name and address, every wireless phone and email
+    found (in page order, as many as the page lists), the remarks and the proxy used.
+    The four-phone, three-email layout of the output CSV is only applied by the exporter.
+    """
+    __slots__ = ('name', 'address', 'phones', 'emails', 'remarks', 'proxy')
+
+    def __init__(self, name='', address='', phones=(), emails=(), remarks='', proxy=''):
+        self.name = name or ''
+        self.address = address or ''
+        self.phones = _unique(phones)
+        self.emails = _unique(emails)
+        self.remarks = remarks or ''
+        self.proxy = proxy or ''
+
+    def is_positive(self):
+        return bool(self.name or self.phones or self.emails)
+
+    def as_dict(self):
+        return {'name': self.name, 'address': self.address, 'phones': list(self.phones),
+                'emails': list(self.emails), 'remarks': self.remarks, 'proxy': self.proxy}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of as_dict; also reads the old 'Phone 1'..'Email 3' dicts (e.g. older cache entries)."""
+        if 'TPS Verified Name' in data:
+            return cls(data.get('TPS Verified Name'), data.get('TPS Address'),
+                       [data.get(f'Phone {i}') for i in range(1, 5)],
+                       [data.get(f'Email {i}') for i in range(1, 4)],
+                       data.get('Remarks'), data.get('Used Proxy'))
+        return cls(data.get('name'), data.get('address'), data.get('phones', ()), data.get('emails', ()),
+                   data.get('remarks'), data.get('proxy'))
+
+    def __eq__(self, other):
+        if not isinstance(other, PersonRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return (f"PersonRecord(name={self.name!r}, address={self.address!r}, phones={self.phones!r}, "
+                f"emails={self.emails!r}, remarks={self.remarks!r}, proxy={self.proxy!r})")
@@ -0,0 +1,212 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+BASE_COOLDOWN_SECONDS = 300
+MAX_COOLDOWN_SECONDS = 24 * 3600
+# A proxy blocked within this window still scores lower once its cooldown is over
+RECENT_BLOCK_SECONDS = 3600
+
+class ProxyHealth:
+    __slots__ = ('proxy', 'attempts', 'successes', 'captchas', 'total_latency',
+                 'blocks', 'strikes', 'last_block', 'cooldown_until')
+
+    def __init__(self, proxy, attempts=0, successes=0, captchas=0, total_latency=0.0,
+                 blocks=0, strikes=0, last_block=None, cooldown_until=0.0):
+        self.proxy = proxy
+        self.attempts = attempts
+        self.successes = successes
+        self.captchas = captchas
+        self.total_latency = total_latency
+        self.blocks = blocks
+        self.strikes = strikes
+        self.last_block = last_block
+        self.cooldown_until = cooldown_until
+
+    def success_rate(self):
+        # Smoothed so a fresh proxy starts at 0.5 instead of 0 or 1
+        return (self.successes + 1) / (self.attempts + 2)
+
+    def captcha_rate(self):
+        return self.captchas / self.attempts if self.attempts else 0.0
+
+    def avg_latency(self):
+        return self.total_latency / self.attempts if self.attempts else 0.0
+
+    def score(self, now):
+        score = self.success_rate()
+        score *= 1 - 0.5 * min(self.captcha_rate(), 1.0)
+        score /= 1 + self.avg_latency() / 30
+        if self.last_block is not None and now - self.last_block < RECENT_BLOCK_SECONDS:
+            score *= 0.5
+        return max(score, 0.01)
+
+    def as_row(self):
+        return (self.proxy, self.attempts, self.successes, self.captchas, self.total_latency,
+                self.blocks, self.strikes, self.last_block, self.cooldown_until)
+
+def save_proxy_health(conn, row, commit=True):
+    cursor = conn.cursor()
+    cursor.execute('''
+    INSERT OR REPLACE INTO proxy_health
+    (proxy, attempts, successes, captchas, total_latency, blocks, strikes, last_block, cooldown_until)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', row)
+    if commit:
+        conn.commit()
+
+def _parse_blocked_time(value):
+    try:
+        # blocked_proxies.blocked_time is sqlite's CURRENT_TIMESTAMP, in UTC
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+class ProxyScheduler:
+    """
+    Picks proxies by a weighted score built from their success rate, captcha rate and
+    latency. A blocked proxy is put in cooldown for BASE_COOLDOWN_SECONDS, doubled for
+    every block in a row up to MAX_COOLDOWN_SECONDS, instead of being dropped for good.
+    Health is kept in the proxy_health table of tps_data.db: writes go through `writer`
+    (a db_writer.DatabaseWriter) when there is one, straight to `conn` otherwise.
+    Like the old pool, each worker gets a proxy nobody else holds whenever possible.
+    """
+
+    def __init__(self, proxies, conn, writer=None, base_cooldown=BASE_COOLDOWN_SECONDS,
+                 max_cooldown=MAX_COOLDOWN_SECONDS):
+        self.conn = conn
+        self.writer = writer
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._in_use = {}
+        self.health = {proxy: ProxyHealth(proxy) for proxy in dict.fromkeys(proxies)}
+        self._load()
+
+    def _load(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT proxy, attempts, successes, captchas, total_latency, blocks, strikes, "
+                       "last_block, cooldown_until FROM proxy_health")
+        known = set()
+        for row in cursor.fetchall():
+            known.add(row[0])
+            if row[0] in self.health:
+                self.health[row[0]] = ProxyHealth(*row)
+        # Proxies banned by the old blocked_proxies table start with one block on record
+        cursor.execute("SELECT proxy, blocked_time FROM blocked_proxies")
+        for proxy, blocked_time in cursor.fetchall():
+            if proxy in self.health and proxy not in known:
+                health = self.health[proxy]
+                health.blocks = health.strikes = 1
+                health.last_block = _parse_blocked_time(blocked_time)
+                health.cooldown_until = health.last_block + self.base_cooldown
+                self._persist(health)
+
+    def _persist(self, health):
+        if self.writer is not None:
+            self.writer.proxy_health(health.as_row())
+        else:
+            save_proxy_health(self.conn, health.as_row())
+
+    def _ready(self, now):
+        return [h for h in self.health.values() if h.cooldown_until <= now]
+
+    def available_count(self):
+        with self._lock:
+            return len(self._ready(time.time()))
+
+    def next_ready_in(self):
+        """Seconds until the first proxy leaves cooldown (0 if one is ready, None if there are none)."""
+        with self._lock:
+            if not self.health:
+                return None
+            return max(0.0, min(h.cooldown_until for h in self.health.values()) - time.time())
+
+    def acquire(self, previous=None, max_wait=0):
+        """
+        Return the proxy to use next, or None when all of them are cooling down for longer
+        than max_wait seconds. `previous` is released first and avoided if there is a choice.
+        """
+        with self._lock:
+            if previous is not None:
+                self._release(previous)
+        deadline = time.time() + max_wait
+        while True:
+            with self._lock:
+                now = time.time()
+                ready = self._ready(now)
+                if ready:
+                    return self._pick(ready, previous, now)
+                if not self.health:
+                    return None
+                wait = min(h.cooldown_until for h in self.health.values()) - now
+            if now + wait > deadline:
+                return None
+            logger.info(f"All proxies are cooling down, waiting {wait:.0f}s")
+            time.sleep(max(wait, 0.1))
+
+    def _pick(self, ready, previous, now):
+        # Prefer proxies nobody else is holding; share the least used ones otherwise
+        least_used = min(self._in_use.get(h.proxy, 0) for h in ready)
+        candidates = [h for h in ready if self._in_use.get(h.proxy, 0) == least_used]
+        if len(candidates) > 1:
+            candidates = [h for h in candidates if h.proxy != previous] or candidates
+        choice = random.choices(candidates, weights=[h.score(now) for h in candidates])[0]
+        self._in_use[choice.proxy] = self._in_use.get(choice.proxy, 0) + 1
+        return choice.proxy
+
+    def release(self, proxy):
+        with self._lock:
+            self._release(proxy)
+
+    def _release(self, proxy):
+        count = self._in_use.get(proxy, 0) - 1
+        if count > 0:
+            self._in_use[proxy] = count
+        else:
+            self._in_use.pop(proxy, None)
+
+    def record_attempt(self, proxy, success, latency=None, captchas=0):
+        with self._lock:
+            health = self.health.get(proxy)
+            if health is None:
+                return
+            health.attempts += 1
+            health.captchas += captchas
+            if latency is not None:
+                health.total_latency += latency
+            if success:
+                health.successes += 1
+                health.strikes = 0
+            self._persist(health)
+
+    def record_block(self, proxy, latency=None):
+        """Count a failed attempt and put the proxy in cooldown, twice as long as after its last block."""
+        with self._lock:
+            self._release(proxy)
+            health = self.health.get(proxy)
+            if health is None:
+                return
+            now = time.time()
+            health.attempts += 1
+            if latency is not None:
+                health.total_latency += latency
+            health.blocks += 1
+            health.strikes += 1
+            health.last_block = now
+            cooldown = min(self.base_cooldown * 2 ** (health.strikes - 1), self.max_cooldown)
+            health.cooldown_until = now + cooldown
+            self._persist(health)
+        logger.warning(f"Proxy {proxy} blocked {health.strikes} time(s) in a row, cooling down for {cooldown:.0f}s")
+
+    def summary(self):
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self.health.values(), key=lambda h: h.score(now), reverse=True)
+            cooling = sum(1 for h in ranked if h.cooldown_until > now)
+            top = ', '.join(f"{h.proxy.split(':')[0]} {h.successes}/{h.attempts} ok" for h in ranked[:3])
+        return f"{len(ranked)} proxies, {cooling} cooling down; best: {top}"
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GLOBAL_RATE = 2.0
+DEFAULT_GLOBAL_BURST = 5
+DEFAULT_PROXY_RATE = 0.5
+DEFAULT_PROXY_BURST = 3
+
+class TokenBucket:
+    """
+    Holds up to `burst` tokens, refilled at `rate` tokens per second. reserve() takes a
+    token even when the bucket is empty and returns how long the caller has to wait
+    for it, so concurrent callers queue up in order instead of racing for refills.
+    A rate of 0 or less means unlimited.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, now=None):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic() if now is None else now
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+class RateLimiter:
+    """
+    One global bucket shared by every session plus one bucket per proxy. wait(proxy)
+    blocks until both allow another navigation. Safe to share between worker threads.
+    """
+
+    def __init__(self, global_rate=DEFAULT_GLOBAL_RATE, global_burst=DEFAULT_GLOBAL_BURST,
+                 proxy_rate=DEFAULT_PROXY_RATE, proxy_burst=DEFAULT_PROXY_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.proxy_rate = proxy_rate
+        self.proxy_burst = proxy_burst
+        self._proxy_buckets = {}
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _bucket(self, proxy):
+        with self._lock:
+            bucket = self._proxy_buckets.get(proxy)
+            if bucket is None:
+                bucket = self._proxy_buckets[proxy] = TokenBucket(self.proxy_rate, self.proxy_burst)
+            return bucket
+
+    def reserve(self, proxy=None):
+        """Take a slot from both buckets and return the seconds to wait before using it."""
+        now = time.monotonic()
+        delay = self.global_bucket.reserve(now)
+        if proxy is not None:
+            delay = max(delay, self._bucket(proxy).reserve(now))
+        if delay > 0:
+            with self._lock:
+                self.waits += 1
+                self.waited_seconds += delay
+        return delay
+
+    def wait(self, proxy=None):
+        delay = self.reserve(proxy)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def summary(self):
+        return f"rate limiter waited {self.waits} times for {self.waited_seconds:.0f}s in total"
+
+# Shared by every scrape_person_data call and HTTP fetch in the process; cap.py
+# replaces it from the command line
+limiter = RateLimiter()
+
+def configure(global_rate=DEFAULT_GLOBAL_RATE, global_burst=DEFAULT_GLOBAL_BURST,
+              proxy_rate=DEFAULT_PROXY_RATE, proxy_burst=DEFAULT_PROXY_BURST):
+    global limiter
+    limiter = RateLimiter(global_rate, global_burst, proxy_rate, proxy_burst)
+    return limiter
+
+def throttle(proxy=None):
+    """Wait for a navigation slot for `proxy`; call before every page load."""
+    return limiter.wait(proxy)
+
+async def throttle_async(proxy=None):
+    """throttle() for coroutines: sleeps without blocking the event loop."""
+    delay = limiter.reserve(proxy)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return delay
@@ -0,0 +1,77 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Everything the page can tell us in one evaluation. Returns the list of signals currently true.
+PAGE_SIGNALS_SCRIPT = """
+var text = document.body ? document.body.innerText : '';
+var signals = [];
+if (/Access Denied|Sorry, you have been blocked|This site can.t be reached/.test(text)) { signals.push('blocked'); }
+if (text.indexOf('Access to this page has been denied') !== -1 || document.querySelector('#px-captcha')) { signals.push('press_hold'); }
+if (text.indexOf('Just a moment...') !== -1 || text.indexOf('Captcha') !== -1 ||
+    document.querySelector('iframe[src*="challenges.cloudflare.com"]')) { signals.push('click_captcha'); }
+if (document.querySelector('#personDetails')) { signals.push('details'); }
+var xpaths = [
+    '/html/body/div[3]/div/div[2]/div[3]/div[1]',
+    '/html/body/div[3]/div/div[2]/div[1]/div[1]',
+    '/html/body/div[2]/div/div[2]/div[1]/div[1]'
+];
+for (var i = 0; i < xpaths.length; i++) {
+    var node = document.evaluate(xpaths[i], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (node && /^\\s*\\d+\\s+record/i.test(node.textContent)) { signals.push('results'); break; }
+}
+if (/no (records|results) found/i.test(text)) { signals.push('not_found'); }
+if (document.querySelector('.fc-dialog')) { signals.push('consent'); }
+return signals;
+"""
+
+CHALLENGE_SIGNALS = ('press_hold', 'click_captcha')
+
+# Signals that end the wait for each phase
+PHASE_SIGNALS = {
+    'results': ('results', 'not_found', 'details', 'press_hold', 'click_captcha', 'blocked'),
+    'details': ('details', 'press_hold', 'click_captcha', 'blocked'),
+    'challenge': CHALLENGE_SIGNALS,
+}
+
+# Upper bound in seconds for each phase; these replace the old fixed sleeps
+PHASE_TIMEOUTS = {
+    'results': 15,
+    'details': 8,
+    'challenge': 5,
+    'challenge_cleared': 10,
+}
+
+def get_page_signals(sb):
+    try:
+        return sb.execute_script(PAGE_SIGNALS_SCRIPT) or []
+    except Exception as e:
+        logger.debug(f"Page signal check failed: {e}")
+        return []
+
+def match_phase(phase, signals):
+    """Return the signal that ends `phase` ('cleared' for challenge_cleared), or None."""
+    if phase == 'challenge_cleared':
+        return 'cleared' if signals and not any(s in CHALLENGE_SIGNALS for s in signals) else None
+    return next((s for s in PHASE_SIGNALS[phase] if s in signals), None)
+
+def wait_for_page_state(sb, phase, timeout=None, poll_interval=0.25):
+    """
+    Poll the page until a signal for this phase is true and return it, or None once the
+    phase's timeout budget runs out. The 'challenge_cleared' phase waits until no
+    captcha marker is left and returns 'cleared'.
+    """
+    if timeout is None:
+        timeout = PHASE_TIMEOUTS[phase]
+    started = time.time()
+    deadline = started + timeout
+    while True:
+        found = match_phase(phase, get_page_signals(sb))
+        if found:
+            logger.info(f"Page ready for '{phase}' ({found}) after {time.time() - started:.1f}s")
+            return found
+        if time.time() >= deadline:
+            logger.info(f"No '{phase}' signal within {timeout}s, continuing")
+            return None
+        time.sleep(poll_interval)
@@ -0,0 +1,181 @@
+import collections
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Why an attempt failed. A real "no record found" is not a failure: it is saved, never retried.
+TRANSIENT_NETWORK = 'transient_network'
+PROXY_BLOCK = 'proxy_block'
+CHALLENGE_TIMEOUT = 'challenge_timeout'
+SELECTOR_MISS = 'selector_miss'
+# The browser died or failed in a way nothing else explains; only a new one helps
+BROWSER_ERROR = 'browser_error'
+# A bug or bad input on our side (TypeError, AttributeError, ...): every retry would repeat it
+INTERNAL_ERROR = 'internal_error'
+
+# Attempts of one row, whatever their failures
+MAX_ATTEMPTS = 5
+
+PROXY_ERROR_MARKERS = ('proxy', 'err_tunnel_connection_failed')
+SESSION_LOST_MARKERS = ('invalid session id', 'chrome not reachable', 'disconnected', 'no such window',
+                        'target window already closed', 'session deleted', 'browser has closed')
+NETWORK_ERROR_MARKERS = ('timed out', 'timeout', 'err_connection', 'err_name_not_resolved', 'err_internet_disconnected',
+                         'err_network_changed', 'err_address_unreachable', 'connection reset', 'connection aborted',
+                         'connection refused', 'remote end closed')
+SELECTOR_ERROR_MARKERS = ('no such element', 'cannot read properties of null', 'element not found',
+                          'was not present', 'was not visible', 'is not clickable')
+# Raised by our own code, never by the browser or the network
+PROGRAMMING_ERRORS = (TypeError, AttributeError, NameError, LookupError, ValueError, ArithmeticError, AssertionError)
+# Base classes of the errors selenium and CDP mode raise for the browser itself
+BROWSER_EXCEPTIONS = ('WebDriverException', 'ProtocolException', 'ConnectionClosed')
+
+class RetryRule:
+    """
+    What to do after a failure of one class: wait base_delay * 2^(n-1) seconds (at most
+    max_delay, with jitter) before the nth retry, give the row up after max_failures of
+    them, start a new browser or not, and move to another proxy after rotate_after
+    failures in a row (0: never).
+    """
+    __slots__ = ('max_failures', 'base_delay', 'max_delay', 'new_session', 'rotate_after')
+
+    def __init__(self, max_failures, base_delay, max_delay, new_session, rotate_after):
+        self.max_failures = max_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.new_session = new_session
+        self.rotate_after = rotate_after
+
+    def delay(self, failures):
+        if not self.base_delay:
+            return 0.0
+        delay = min(self.base_delay * 2 ** (failures - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+RULES = {
+    # A dropped connection or slow load: same browser and proxy after a backoff,
+    # another proxy once it keeps happening
+    TRANSIENT_NETWORK: RetryRule(max_failures=4, base_delay=2, max_delay=30, new_session=False, rotate_after=3),
+    # The proxy is burnt: cooled down by the scheduler, retried right away elsewhere
+    PROXY_BLOCK: RetryRule(max_failures=5, base_delay=0, max_delay=0, new_session=True, rotate_after=1),
+    # A captcha that would not clear: a fresh browser first, then a fresh proxy
+    CHALLENGE_TIMEOUT: RetryRule(max_failures=3, base_delay=5, max_delay=20, new_session=True, rotate_after=2),
+    # The page loaded but had no details button or section: one quick retry on the same
+    # session in case it was half rendered, then it is a permanent miss
+    SELECTOR_MISS: RetryRule(max_failures=2, base_delay=1, max_delay=1, new_session=False, rotate_after=0),
+    BROWSER_ERROR: RetryRule(max_failures=3, base_delay=2, max_delay=10, new_session=True, rotate_after=0),
+    INTERNAL_ERROR: RetryRule(max_failures=1, base_delay=0, max_delay=0, new_session=False, rotate_after=0),
+}
+
+def classify_exception(e):
+    """Failure class of an exception raised by a lookup attempt."""
+    if isinstance(e, PROGRAMMING_ERRORS):
+        return INTERNAL_ERROR
+    message = str(e).lower()
+    if any(marker in message for marker in PROXY_ERROR_MARKERS):
+        return PROXY_BLOCK
+    if any(marker in message for marker in SESSION_LOST_MARKERS):
+        return BROWSER_ERROR
+    name = type(e).__name__
+    if name in ('NoSuchElementException', 'ElementNotVisibleException', 'ElementNotInteractableException',
+                'ElementClickInterceptedException') or any(marker in message for marker in SELECTOR_ERROR_MARKERS):
+        return SELECTOR_MISS
+    if isinstance(e, (TimeoutError, ConnectionError)) or name in ('TimeoutException', 'ReadTimeout', 'ConnectTimeout',
+                                                                   'ConnectionError', 'ChunkedEncodingError'):
+        return TRANSIENT_NETWORK
+    if any(marker in message for marker in NETWORK_ERROR_MARKERS) or 'connection' in message:
+        return TRANSIENT_NETWORK
+    # seleniumbase also raises plain Exception and OSError when the browser misbehaves
+    if (type(e) is Exception or isinstance(e, OSError)
+            or any(cls.__name__ in BROWSER_EXCEPTIONS for cls in type(e).__mro__)):
+        return BROWSER_ERROR
+    return INTERNAL_ERROR
+
+def classify_result(data, is_blocked, attempt=None):
+    """
+    Failure class of a lookup that returned (data, is_blocked), or None if it succeeded.
+    scrape_person_data notes why it returned no data in attempt['failure'].
+    """
+    if is_blocked:
+        return PROXY_BLOCK
+    if data is not None:
+        return None
+    return (attempt or {}).get('failure') or TRANSIENT_NETWORK
+
+def note_failure(attempt, failure):
+    """Tell the retry loop why this attempt has no data (see classify_result)."""
+    if attempt is not None:
+        attempt['failure'] = failure
+
+class Decision:
+    __slots__ = ('retry', 'delay', 'new_session', 'rotate_proxy')
+
+    def __init__(self, retry, delay, new_session, rotate_proxy):
+        self.retry = retry
+        self.delay = delay
+        self.new_session = new_session
+        self.rotate_proxy = rotate_proxy
+
+class RowRetries:
+    """The failures of one row so far, and the decision after each new one."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempts = 0
+        self.failures = collections.Counter()
+        self.streak_class = None
+        self.streak = 0
+        self.last_failure = None
+
+    def record(self, failure):
+        self.attempts += 1
+        self.failures[failure] += 1
+        self.streak = self.streak + 1 if failure == self.streak_class else 1
+        self.streak_class = failure
+        self.last_failure = failure
+        rule = self.policy.rules[failure]
+        retry = self.failures[failure] < rule.max_failures and self.attempts < self.policy.max_attempts
+        rotate = bool(rule.rotate_after) and self.streak >= rule.rotate_after
+        decision = Decision(retry, rule.delay(self.failures[failure]) if retry else 0.0,
+                            rule.new_session or rotate, rotate)
+        self.policy.record(failure, decision)
+        return decision
+
+    def describe(self):
+        return ', '.join(f"{count} {failure}" for failure, count in self.failures.items())
+
+class RetryPolicy:
+    """
+    Per-class retry rules shared by every lookup loop, with counts of the failures seen,
+    the retries made and the rows given up per class. Safe to share between threads.
+    """
+
+    def __init__(self, rules=RULES, max_attempts=MAX_ATTEMPTS):
+        self.rules = rules
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.failures = collections.Counter()
+        self.given_up = collections.Counter()
+        self.sessions_kept = 0
+
+    def row(self):
+        return RowRetries(self)
+
+    def record(self, failure, decision):
+        with self._lock:
+            self.failures[failure] += 1
+            if not decision.retry:
+                self.given_up[failure] += 1
+            elif not decision.new_session:
+                self.sessions_kept += 1
+
+    def summary(self):
+        with self._lock:
+            failures = ', '.join(f"{failure} {count}" for failure, count in self.failures.most_common()) or 'none'
+            given_up = ', '.join(f"{failure} {count}" for failure, count in self.given_up.most_common()) or 'none'
+            kept = self.sessions_kept
+        return f"failures: {failures}; rows given up after: {given_up}; {kept} retries kept their browser"
+
+# Shared by the main loop and the worker threads, like rate_limiter.limiter
+policy = RetryPolicy()
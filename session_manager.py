@@ -0,0 +1,87 @@
+from seleniumbase import SB
+import logging
+import time
+
+from challenge_state import tracker as challenge_tracker, session_key
+
+logger = logging.getLogger(__name__)
+
+def open_url(sb, url):
+    """Navigate to url, reusing the CDP session if the browser already has one."""
+    if getattr(sb.driver, '_is_using_cdp', False):
+        try:
+            sb.cdp.open(url)
+            return
+        except Exception as e:
+            logger.warning(f"CDP navigation failed, re-activating CDP mode: {e}")
+    sb.activate_cdp_mode(url)
+
+class BrowserSessionManager:
+    """
+    Keeps one browser alive per proxy for its whole rotation window.
+    A new Chrome is only launched when the proxy changes or the session is discarded.
+    """
+
+    def __init__(self, browser_options):
+        self.browser_options = browser_options
+        self.proxy = None
+        self.sb = None
+        self._context = None
+        self.row_start_seconds = 0.0
+        self.total_start_seconds = 0.0
+        self.sessions_started = 0
+        self.rows = 0
+
+    def get(self, proxy):
+        """Return a live sb bound to proxy, starting a browser only when needed."""
+        if self.sb is not None and self.proxy == proxy:
+            return self.sb
+        self.close()
+        started = time.time()
+        self._context = SB(**self.browser_options(proxy))
+        try:
+            self.sb = self._context.__enter__()
+        except Exception:
+            self._context = None
+            raise
+        self.proxy = proxy
+        elapsed = time.time() - started
+        self.row_start_seconds += elapsed
+        self.total_start_seconds += elapsed
+        self.sessions_started += 1
+        logger.info(f"Started browser session for proxy {proxy} in {elapsed:.1f}s")
+        return self.sb
+
+    def close(self):
+        """Tear the browser down, e.g. when its proxy is rotated or blocked."""
+        if self.sb is not None:
+            # A new browser starts without the old one's clearance cookies
+            challenge_tracker.forget(session_key(self.sb, self.proxy))
+        if self._context is not None:
+            try:
+                self._context.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Error closing browser session: {e}")
+        self._context = None
+        self.sb = None
+        self.proxy = None
+
+    def record_row(self, row_number):
+        """Log how much of this row (all its attempts) went into starting browsers."""
+        self.rows += 1
+        logger.info(f"Session start overhead for row {row_number}: {self.row_start_seconds:.1f}s")
+        overhead = self.row_start_seconds
+        self.row_start_seconds = 0.0
+        return overhead
+
+    def summary(self):
+        per_row = self.total_start_seconds / self.rows if self.rows else 0.0
+        return (f"{self.sessions_started} browser sessions for {self.rows} rows, "
+                f"{self.total_start_seconds:.0f}s total start-up, {per_row:.1f}s per row")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
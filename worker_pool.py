@@ -0,0 +1,160 @@
+import logging
+import queue
+import threading
+import time
+
+from database import empty_record
+from session_manager import BrowserSessionManager
+from lookup_cache import normalize_lookup_key, is_positive_result, is_cacheable_result
+from checkpoint import DONE, FAILED
+import metrics
+import retry_policy
+from metrics import timed_phase, DB_WRITE, HTTP_LOOKUP, BROWSER_START
+
+logger = logging.getLogger(__name__)
+
+def run_worker_pool(rows, input_file_name, proxy_scheduler, workers, scrape_fn, browser_options, writer,
+                    max_proxy_uses=15, max_retries=5, http_pool=None, progress_callback=None,
+                    progress_interval=60, progress_rows=None, max_cooldown_wait=600):
+    """
+    Scrape `rows` (row_ids, name, address) with `workers` browsers running at once; the
+    result for each lookup is saved for every row id sharing it.
+    Each worker keeps its own proxy from `proxy_scheduler` (a proxy_scheduler.ProxyScheduler)
+    and every database write goes through `writer`, a db_writer.DatabaseWriter.
+    Phase timings of every row go to metrics.recorder. Failed attempts are retried (or
+    not) as retry_policy.policy decides for their failure class.
+    With an http_pool, rows are tried over HTTP first and only challenges reach the browser.
+    progress_callback, if given, is called from this thread every progress_interval
+    seconds while the workers run, and also after every progress_rows finished rows when
+    that is set (cap.py uses it to append to the output CSV).
+    """
+    row_queue = queue.Queue()
+    for row in rows:
+        row_queue.put(row)
+    total_rows = row_queue.qsize()
+    stats = {'processed': 0, 'failed': 0}
+    stats_lock = threading.Lock()
+    # Wakes the progress loop early: set every progress_rows rows and when a worker exits
+    progress_due = threading.Event()
+    running = [workers]
+
+    def worker(worker_id):
+        sessions = BrowserSessionManager(browser_options)
+        try:
+            run_worker(worker_id, sessions)
+        finally:
+            sessions.close()
+            logger.info(f"[worker {worker_id}] Browser sessions: {sessions.summary()}")
+            with stats_lock:
+                running[0] -= 1
+            progress_due.set()
+
+    def run_worker(worker_id, sessions):
+        current_proxy = proxy_scheduler.acquire(max_wait=max_cooldown_wait)
+        proxy_use_count = 0
+        while current_proxy is not None:
+            try:
+                row_ids, name, address = row_queue.get_nowait()
+            except queue.Empty:
+                break
+            index = row_ids[0]
+            logger.info(f"[worker {worker_id}] Processing row {index + 1}: {name} at {address} with proxy {current_proxy}")
+            timing = metrics.recorder.row(row_ids)
+            success = False
+            retries = retry_policy.policy.row()
+            while not success and retries.attempts < max_retries and current_proxy is not None:
+                data, is_blocked = None, False
+                attempt = timing.new_attempt()
+                attempt_start = time.time()
+                try:
+                    if http_pool is not None:
+                        with timed_phase(attempt, HTTP_LOOKUP):
+                            data = http_pool.lookup(name, address, current_proxy, attempt)
+                    if data is None:
+                        sb = sessions.get(current_proxy)
+                        data, is_blocked = scrape_fn(sb, name, address, current_proxy, None, attempt)
+                        if http_pool is not None and not is_blocked:
+                            http_pool.load_browser_cookies(current_proxy, sb)
+                    failure = retry_policy.classify_result(data, is_blocked, attempt)
+                    outcome = 'blocked' if is_blocked else 'ok' if data is not None else 'empty'
+                except Exception as e:
+                    logger.error(f"[worker {worker_id}] Error: {str(e)}")
+                    data, failure, outcome = None, retry_policy.classify_exception(e), 'error'
+                latency = time.time() - attempt_start
+                attempt['failure'] = failure
+                timing.end_attempt(attempt, current_proxy, outcome, latency)
+                if failure is None:
+                    proxy_scheduler.record_attempt(current_proxy, True, latency, attempt.get('challenges', 0))
+                    with timing.phase(DB_WRITE):
+                        for row_id in row_ids:
+                            writer.save(row_id, data)
+                        if is_cacheable_result(data, attempt):
+                            writer.cache(normalize_lookup_key(name, address), data)
+                    success = True
+                    proxy_use_count += 1
+                    break
+                decision = retries.record(failure)
+                logger.warning(f"[worker {worker_id}] Row {index + 1} attempt {retries.attempts} failed ({failure}): "
+                               f"{'retrying' if decision.retry else 'giving up'}")
+                if failure == retry_policy.PROXY_BLOCK:
+                    proxy_scheduler.record_block(current_proxy, latency)
+                else:
+                    proxy_scheduler.record_attempt(current_proxy, False, latency, attempt.get('challenges', 0))
+                if decision.new_session:
+                    sessions.close()
+                if decision.rotate_proxy:
+                    # A blocked proxy was already released by record_block
+                    previous = None if failure == retry_policy.PROXY_BLOCK else current_proxy
+                    current_proxy = proxy_scheduler.acquire(previous, max_wait=max_cooldown_wait)
+                    proxy_use_count = 0
+                if not decision.retry:
+                    break
+                time.sleep(decision.delay)
+            metrics.add_phase(timing.phases, BROWSER_START, sessions.record_row(index + 1))
+            if not success:
+                logger.error(f"[worker {worker_id}] Failed to process row {index + 1}: {name} "
+                             f"after {retries.attempts} attempts ({retries.describe()})")
+                for row_id in row_ids:
+                    writer.save(row_id, empty_record(f'Failed after {retries.attempts} attempts: {retries.last_failure}',
+                                                     current_proxy))
+            for row_id in row_ids:
+                writer.progress(row_id, input_file_name, DONE if success else FAILED)
+            outcome = ('found' if is_positive_result(data) else 'not_found') if success else 'failed'
+            metrics.recorder.finish(timing, outcome, current_proxy)
+            with stats_lock:
+                stats['processed'] += 1
+                if not success:
+                    stats['failed'] += 1
+                if progress_rows and stats['processed'] % progress_rows == 0:
+                    progress_due.set()
+            if current_proxy is not None and proxy_use_count >= max_proxy_uses:
+                current_proxy = proxy_scheduler.acquire(current_proxy, max_wait=max_cooldown_wait)
+                proxy_use_count = 0
+        if current_proxy is None:
+            logger.error(f"[worker {worker_id}] No more proxies available. Stopping worker.")
+        else:
+            proxy_scheduler.release(current_proxy)
+
+    threads = [threading.Thread(target=worker, args=(i + 1,), name=f'worker-{i + 1}') for i in range(workers)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    if progress_callback is not None:
+        while True:
+            progress_due.wait(progress_interval)
+            progress_due.clear()
+            with stats_lock:
+                if not running[0]:
+                    break
+            try:
+                progress_callback()
+            except Exception as e:
+                logger.error(f"Progress callback failed: {str(e)}")
+    for thread in threads:
+        thread.join()
+    writer.flush()
+    elapsed = time.time() - started
+    rate = stats['processed'] / elapsed * 3600 if elapsed else 0
+    logger.info(f"Worker pool finished {stats['processed']} of {total_rows} rows "
+                f"({stats['failed']} failed) in {elapsed:.0f}s, {rate:.0f} rows/hour with {workers} workers")
+    return stats